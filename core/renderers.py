@@ -0,0 +1,41 @@
+"""
+Renderers de DRF para el proyecto.
+
+ORJSONRenderer reemplaza al JSONRenderer estándar: orjson serializa
+dict/list/str/float/datetime/UUID en C, lo que reduce el costo de
+renderizar respuestas grandes (ej: listas de recomendaciones).
+"""
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Tipos que orjson no soporta nativamente (Decimal, lazy strings, QuerySet,
+# timedelta, etc.) se delegan al encoder de DRF para mantener el mismo formato
+_drf_default = JSONEncoder().default
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_SERIALIZE_NUMPY
+    | orjson.OPT_UTC_Z
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renderer JSON basado en orjson, compatible con JSONRenderer de DRF.
+
+    Respeta el parámetro indent del media type aceptado (siempre a 2 espacios,
+    única indentación que soporta orjson).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        option = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context):
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=_drf_default, option=option)
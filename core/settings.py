@@ -179,6 +179,10 @@ else:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
 
+# Compresión diferida de imágenes de portfolio: la subida guarda el original y
+# `python manage.py compress_portfolio_images` (ej: cron) lo comprime después
+PORTFOLIO_DEFER_IMAGE_COMPRESSION = os.getenv("PORTFOLIO_DEFER_IMAGE_COMPRESSION", "False") == "True"
+
 # ============================================================================
 # DJANGO CONFIGURATION
 # ============================================================================
@@ -206,9 +210,9 @@ REST_FRAMEWORK = {
         'anon': '100/hour',  # 100 peticiones por hora para usuarios anónimos
         'user': '1000/hour'  # 1000 peticiones por hora para usuarios autenticados
     },
-    # Formato de respuesta JSON por defecto
+    # Formato de respuesta JSON por defecto (orjson: serialización en C)
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.ORJSONRenderer',
     ),
     # Parser por defecto
     'DEFAULT_PARSER_CLASSES': (
@@ -279,6 +283,17 @@ CACHES = {
     }
 }
 
+# Modelo TF-IDF del sistema de recomendación: se persiste con joblib en este
+# archivo (abierto con mmap por cada proceso); Redis solo guarda ruta y versión.
+# Requisito: todos los procesos que comparten el Redis deben ver este archivo en
+# la misma ruta (un solo host, o un volumen compartido montado igual en todos
+# los contenedores). Si no, cada host reentrena al no encontrarlo y sobrescribe
+# el puntero en Redis, desalojando el modelo de los demás
+RECOMMENDATION_MODEL_PATH = config(
+    'RECOMMENDATION_MODEL_PATH',
+    default=str(BASE_DIR / 'ml_models' / 'recommendation_model.joblib')
+)
+
 # Configuración de CORS (Cross-Origin Resource Sharing)
 # Permite solicitudes desde estos orígenes
 CORS_ALLOWED_ORIGINS = [
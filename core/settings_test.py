@@ -0,0 +1,38 @@
+"""
+Settings para correr la suite de tests.
+
+Uso:
+    python manage.py test --settings=core.settings_test --keepdb
+
+--keepdb reutiliza la base de datos de test entre corridas (el esquema no se
+recrea cada vez; las migraciones nuevas se aplican igual).
+
+La base sigue siendo PostGIS: los modelos usan PointField y las búsquedas
+por distancia (D, dwithin) no tienen equivalente en SQLite en memoria.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# Hasher rápido: PBKDF2 es deliberadamente lento y los fixtures crean
+# decenas de usuarios. Nunca usar fuera de tests
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Cache y channel layer en memoria del proceso: los tests no dependen de un
+# Redis levantado ni comparten claves con el entorno de desarrollo
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'findmyworker-tests',
+    }
+}
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# El modelo TF-IDF entrenado en tests no pisa el de desarrollo. Ruta fija
+# (git-ignorada): cada corrida reemplaza el mismo archivo, sin dejar residuos.
+# Los tests de recomendación además la sobreescriben con un directorio temporal
+RECOMMENDATION_MODEL_PATH = str(BASE_DIR / '.test_ml_models' / 'recommendation_model.joblib')
@@ -20,6 +20,13 @@ ALLOWED_IMAGE_MIME_TYPES = {
     "image/webp",
 }
 
+# Decoders de Pillow a probar al abrir (evita sondear GIF, BMP, TIFF, etc.)
+ALLOWED_IMAGE_FORMATS = ("JPEG", "PNG", "WEBP")
+
+# Límite de píxeles antes de decodificar (protección contra decompression bombs).
+# Cubre sensores de 48 MP de celulares modernos
+MAX_IMAGE_PIXELS = 50_000_000
+
 # ============================================================================
 # CONFIGURACIÓN DE PROCESAMIENTO DE IMÁGENES
 # ============================================================================
@@ -28,7 +35,20 @@ MAX_IMAGE_WIDTH = 1600  # Ancho máximo, mantiene aspect ratio
 
 IMAGE_QUALITY_JPEG = 80
 IMAGE_QUALITY_WEBP = 80
+IMAGE_WEBP_METHOD = 4  # Balance velocidad/tamaño del encoder WebP (0-6)
 IMAGE_QUALITY_PNG_OPTIMIZE = True
 
-DEFAULT_IMAGE_FORMAT = "JPEG"
-DEFAULT_IMAGE_EXTENSION = "jpg"
+# Salidas comprimidas mayores a este tamaño se vuelcan a un archivo temporal
+IMAGE_SPOOL_MAX_BYTES = 512 * 1024
+
+# WebP por defecto: ~25-35% más liviano que JPEG a calidad percibida similar
+DEFAULT_IMAGE_FORMAT = "WEBP"
+DEFAULT_IMAGE_EXTENSION = "webp"
+
+# ============================================================================
+# CONFIGURACIÓN DEL SISTEMA DE RECOMENDACIÓN (filtros geográficos)
+# ============================================================================
+
+DEFAULT_MAX_DISTANCE_KM = 50  # Radio por defecto cuando solo se envían coordenadas
+KM_PER_DEGREE_LAT = 111.0  # Aproximación: 1° de latitud ≈ 111 km
+EARTH_RADIUS_KM = 6371.0  # Radio medio terrestre (fórmula de haversine)
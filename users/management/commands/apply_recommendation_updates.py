@@ -0,0 +1,45 @@
+"""
+Management command para aplicar al modelo de recomendación los perfiles editados.
+
+Los saves de WorkerProfile solo encolan sus IDs en el cache (signals.py), para
+no cargar, recalcular y persistir el modelo dentro del request. La siguiente
+query de recomendación aplica la cola; este comando la aplica antes, fuera
+del ciclo HTTP (RecommendationEngine.update_workers).
+
+Opcional:
+    - Periódicamente (ej: cada minuto con cron), para que ninguna búsqueda
+      pague la actualización
+
+Usage:
+    python manage.py apply_recommendation_updates
+"""
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from users.services import RecommendationEngine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Aplica al modelo de recomendación los perfiles editados pendientes'
+
+    def handle(self, *args, **options):
+        engine = RecommendationEngine()
+
+        try:
+            applied = engine.apply_pending_updates()
+        except TimeoutError as e:
+            # Otro proceso está escribiendo el modelo: los IDs vuelven a la cola
+            self.stdout.write(self.style.WARNING(f'⚠ {e}; se reintenta en la próxima corrida'))
+            return
+        except Exception as e:
+            logger.warning(f"Actualización parcial del modelo falló, invalidando: {e}")
+            cache.delete_many(['recommendation_model_data', 'recommendation_model_metadata'])
+            self.stdout.write(self.style.ERROR(
+                '✗ Actualización parcial falló: modelo invalidado (se reentrena en la próxima query)'
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {applied} perfiles aplicados al modelo'))
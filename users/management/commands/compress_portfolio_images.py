@@ -0,0 +1,51 @@
+"""
+Management command para comprimir imágenes de portfolio pendientes.
+
+Cuando PORTFOLIO_DEFER_IMAGE_COMPRESSION está activo, las subidas guardan la
+imagen original (is_compressed=False) para no bloquear el request. Este comando
+procesa esos items fuera del ciclo HTTP.
+
+Se debe ejecutar:
+    - Periódicamente (ej: cada pocos minutos con cron)
+
+Usage:
+    python manage.py compress_portfolio_images
+    python manage.py compress_portfolio_images --limit 100
+"""
+
+from django.core.management.base import BaseCommand
+from users.models import PortfolioItem
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Comprime las imágenes de portfolio pendientes (compresión diferida)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Número máximo de items a procesar',
+        )
+    
+    def handle(self, *args, **options):
+        pending = PortfolioItem.objects.filter(is_compressed=False).exclude(image='').order_by('created_at')
+        if options['limit']:
+            pending = pending[:options['limit']]
+        
+        compressed = 0
+        failed = 0
+        for item in pending.iterator():
+            try:
+                item.compress_stored_image()
+                compressed += 1
+            except Exception as e:
+                failed += 1
+                logger.warning(f"No se pudo comprimir la imagen del PortfolioItem {item.pk}: {e}")
+        
+        self.stdout.write(self.style.SUCCESS(f'✓ {compressed} imágenes comprimidas'))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'✗ {failed} imágenes con error (ver logs)'))
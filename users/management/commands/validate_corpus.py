@@ -11,21 +11,66 @@ Verifica:
 Usage:
     python manage.py validate_corpus
     python manage.py validate_corpus --fix-empty  # Generar bios básicas
+    python manage.py validate_corpus --fix-active  # Resincronizar is_active
 """
 
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
-from django.db.models import Q, Count
+from django.db import connections
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.functions import Length
+from django.db.models.lookups import GreaterThanOrEqual
 from users.models import WorkerProfile
+from users.services.dashboard_service import DashboardService
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Barra precalculada para el histograma de profesiones (se recorta por slicing)
+MAX_BAR = '█' * 200
+
+
+@functools.cache
+def _bio_for(profession_code: str, years: int) -> str:
+    """
+    Biografía básica para una combinación (profesión, años de experiencia).
+    
+    Memoizada: hay pocas combinaciones distintas, así que --fix-empty
+    resuelve la mayoría de trabajadores con una búsqueda en el cache.
+    """
+    profession = str(dict(WorkerProfile.ProfessionChoices.choices).get(
+        profession_code, profession_code
+    ))
+    
+    bio_parts = [
+        f"Profesional {profession.lower()} especializado en servicios de calidad.",
+    ]
+    
+    if years > 0:
+        bio_parts.append(f"Cuento con {years} años de experiencia en el rubro.")
+    
+    bio_parts.append(
+        "Ofrezco atención personalizada y trabajo garantizado. "
+        "Disponible para presupuestos sin compromiso."
+    )
+    
+    return ' '.join(bio_parts)
+
 
 class Command(BaseCommand):
     help = 'Valida la calidad del corpus de trabajadores para el sistema de recomendación'
     
     MIN_BIO_LENGTH = 50  # Caracteres mínimos para una bio útil
     
+    # Estado de calidad (calculado en SQL por _quality_summary) -> (estilo, mensaje)
+    QUALITY_STATUS_MESSAGES = {
+        'excellent': ('SUCCESS', '✓ Corpus en excelente estado para entrenar modelo'),
+        'acceptable': ('WARNING', '⚠ Corpus aceptable, pero se recomienda mejorar datos'),
+        'poor': ('ERROR', '✗ Corpus necesita mejoras significativas'),
+    }
+    
     def add_arguments(self, parser):
         parser.add_argument(
             '--fix-empty',
@@ -33,6 +78,12 @@ class Command(BaseCommand):
             help='Genera biografías básicas para trabajadores sin bio',
         )
         
+        parser.add_argument(
+            '--fix-active',
+            action='store_true',
+            help='Resincroniza WorkerProfile.is_active con User.is_active',
+        )
+        
         parser.add_argument(
             '--detailed',
             action='store_true',
@@ -41,49 +92,116 @@ class Command(BaseCommand):
     
     def handle(self, *args, **options):
         fix_empty = options['fix_empty']
+        fix_active = options['fix_active']
         detailed = options['detailed']
         
-        self.stdout.write(self.style.WARNING('='*70))
-        self.stdout.write(self.style.WARNING('Validando Corpus de Trabajadores'))
-        self.stdout.write(self.style.WARNING('='*70 + '\n'))
+        # La copia desnormalizada de is_active se repara antes de contar: todas
+        # las secciones filtran por ella
+        if fix_active:
+            self.stdout.write(self._sync_is_active())
         
         # Estadísticas generales
         total_workers = WorkerProfile.objects.count()
-        active_workers = WorkerProfile.objects.filter(user__is_active=True).count()
-        
-        self.stdout.write(f'Total de trabajadores: {total_workers}')
-        self.stdout.write(f'Trabajadores activos: {active_workers}\n')
-        
-        # 1. Validar biografías
-        self._validate_bios(fix_empty, detailed)
-        
-        # 2. Validar ubicaciones
-        self._validate_locations(detailed)
-        
-        # 3. Distribución de profesiones
-        self._analyze_professions()
-        
-        # 4. Estadísticas de ratings
-        self._analyze_ratings()
-        
-        # 5. Resumen de calidad
-        self._quality_summary()
+        active_workers = WorkerProfile.objects.filter(is_active=True).count()
+        out_of_sync = WorkerProfile.objects.exclude(is_active=F('user__is_active')).count()
+        
+        # Cada sección acumula sus líneas y las emite en una sola escritura
+        header = [
+            self.style.WARNING('='*70),
+            self.style.WARNING('Validando Corpus de Trabajadores'),
+            self.style.WARNING('='*70 + '\n'),
+            f'Total de trabajadores: {total_workers}',
+            f'Trabajadores activos: {active_workers}\n',
+        ]
+        if out_of_sync:
+            header.append(self.style.ERROR(
+                f'✗ is_active desincronizado con el usuario: {out_of_sync} trabajadores\n'
+                '    Usa: python manage.py validate_corpus --fix-active\n'
+            ))
+        self.stdout.write('\n'.join(header))
+        
+        sections = [
+            (self._validate_bios, (fix_empty, detailed)),   # 1. Biografías
+            (self._validate_locations, (detailed,)),        # 2. Ubicaciones
+            (self._analyze_professions, ()),                # 3. Profesiones
+            (self._analyze_ratings, ()),                    # 4. Ratings
+            (self._quality_summary, ()),                    # 5. Resumen de calidad
+        ]
+        outputs = [None] * len(sections)
+        
+        # --fix-empty modifica biografías: esa sección corre primero para que
+        # el resto de secciones reporte sobre los datos ya corregidos
+        if fix_empty:
+            outputs[0] = self._validate_bios(fix_empty, detailed)
+        
+        # Las secciones son independientes: se ejecutan en paralelo (una conexión
+        # por hilo) y se imprimen en el orden original
+        with ThreadPoolExecutor(max_workers=len(sections)) as executor:
+            futures = {
+                executor.submit(self._run_section, method, *args): index
+                for index, (method, args) in enumerate(sections)
+                if outputs[index] is None
+            }
+            for future in as_completed(futures):
+                outputs[futures[future]] = future.result()
+        
+        for output in outputs:
+            self.stdout.write(output)
+    
+    def _run_section(self, method, *args) -> str:
+        """Ejecuta una sección en un hilo del pool y cierra su conexión al terminar."""
+        try:
+            return method(*args)
+        finally:
+            connections.close_all()
+    
+    def _sync_is_active(self) -> str:
+        """
+        Repara WorkerProfile.is_active donde difiere de User.is_active.
+        
+        La copia solo se sincroniza en el post_save de User; QuerySet.update()
+        o bulk_update sobre usuarios (ej: desactivación masiva) la desfasan.
+        """
+        activated = WorkerProfile.objects.filter(
+            is_active=False, user__is_active=True
+        ).update(is_active=True)
+        deactivated = WorkerProfile.objects.filter(
+            is_active=True, user__is_active=False
+        ).update(is_active=False)
+        
+        if activated or deactivated:
+            # update() no dispara post_save: invalidar los caches una sola vez
+            cache.delete_many(['recommendation_model_data', 'recommendation_model_metadata'])
+            DashboardService.invalidate_cache()
+        
+        return self.style.SUCCESS(
+            f'🔧 is_active resincronizado: {activated} activados, {deactivated} desactivados\n'
+        )
     
-    def _validate_bios(self, fix_empty: bool, detailed: bool):
+    def _validate_bios(self, fix_empty: bool, detailed: bool) -> str:
         """Valida calidad de biografías."""
-        self.stdout.write(self.style.HTTP_INFO('\n📝 Validación de Biografías:'))
-        self.stdout.write('-' * 70)
+        lines = [self.style.HTTP_INFO('\n📝 Validación de Biografías:'), '-' * 70]
         
         # Trabajadores sin bio
         empty_bio = WorkerProfile.objects.filter(
             Q(bio='') | Q(bio__isnull=True),
-            user__is_active=True
+            is_active=True
         )
-        empty_count = empty_bio.count()
+        # Materializar una sola vez cuando se necesitan los objetos (detalle o fix)
+        empty_workers = None
+        if detailed or fix_empty:
+            empty_workers = list(
+                empty_bio.select_related('user').only(
+                    'bio', 'profession', 'years_experience', 'user__email'
+                ).iterator(chunk_size=2000)
+            )
+            empty_count = len(empty_workers)
+        else:
+            empty_count = empty_bio.count()
         
         # Biografías muy cortas
         short_bio = WorkerProfile.objects.filter(
-            user__is_active=True
+            is_active=True
         ).exclude(
             Q(bio='') | Q(bio__isnull=True)
         ).extra(
@@ -93,7 +211,7 @@ class Command(BaseCommand):
         
         # Biografías útiles
         good_bio = WorkerProfile.objects.filter(
-            user__is_active=True
+            is_active=True
         ).extra(
             where=[f"LENGTH(bio) >= {self.MIN_BIO_LENGTH}"]
         )
@@ -101,17 +219,17 @@ class Command(BaseCommand):
         
         # Mostrar resultados
         if empty_count > 0:
-            self.stdout.write(
+            lines.append(
                 self.style.ERROR(f'✗ Sin biografía: {empty_count} trabajadores')
             )
             if detailed:
-                for worker in empty_bio[:5]:
-                    self.stdout.write(f'  - {worker.user.email} ({worker.get_profession_display()})')
+                for worker in empty_workers[:5]:
+                    lines.append(f'  - {worker.user.email} ({worker.get_profession_display()})')
         else:
-            self.stdout.write(self.style.SUCCESS('✓ Todos tienen biografía'))
+            lines.append(self.style.SUCCESS('✓ Todos tienen biografía'))
         
         if short_count > 0:
-            self.stdout.write(
+            lines.append(
                 self.style.WARNING(
                     f'⚠ Biografía corta (< {self.MIN_BIO_LENGTH} chars): {short_count} trabajadores'
                 )
@@ -119,11 +237,11 @@ class Command(BaseCommand):
             if detailed:
                 for worker in short_bio[:5]:
                     bio_len = len(worker.bio) if worker.bio else 0
-                    self.stdout.write(
+                    lines.append(
                         f'  - {worker.user.email}: "{worker.bio[:40]}..." ({bio_len} chars)'
                     )
         
-        self.stdout.write(
+        lines.append(
             self.style.SUCCESS(
                 f'✓ Biografías útiles (>= {self.MIN_BIO_LENGTH} chars): {good_count} trabajadores'
             )
@@ -131,79 +249,84 @@ class Command(BaseCommand):
         
         # Fix biografías vacías si se solicitó
         if fix_empty and empty_count > 0:
-            self.stdout.write('\n🔧 Generando biografías básicas...')
-            fixed = 0
-            for worker in empty_bio:
+            lines.append('\n🔧 Generando biografías básicas...')
+            for worker in empty_workers:
                 worker.bio = self._generate_basic_bio(worker)
-                worker.save()
-                fixed += 1
+            WorkerProfile.objects.bulk_update(empty_workers, ['bio'], batch_size=500)
+            fixed = len(empty_workers)
             
-            self.stdout.write(
+            # bulk_update no dispara post_save: invalidar los caches una sola vez
+            cache.delete_many(['recommendation_model_data', 'recommendation_model_metadata'])
+            DashboardService.invalidate_cache()
+            
+            lines.append(
                 self.style.SUCCESS(f'✓ {fixed} biografías generadas')
             )
+        
+        return '\n'.join(lines)
     
-    def _validate_locations(self, detailed: bool):
+    def _validate_locations(self, detailed: bool) -> str:
         """Valida ubicaciones geográficas."""
-        self.stdout.write(self.style.HTTP_INFO('\n📍 Validación de Ubicaciones:'))
-        self.stdout.write('-' * 70)
+        lines = [self.style.HTTP_INFO('\n📍 Validación de Ubicaciones:'), '-' * 70]
         
         no_location = WorkerProfile.objects.filter(
-            location__isnull=True,
-            user__is_active=True
+            is_geolocated=False,
+            is_active=True
         )
         no_location_count = no_location.count()
         
         with_location = WorkerProfile.objects.filter(
-            location__isnull=False,
-            user__is_active=True
+            is_geolocated=True,
+            is_active=True
         )
         with_location_count = with_location.count()
         
         if no_location_count > 0:
-            self.stdout.write(
+            lines.append(
                 self.style.WARNING(
                     f'⚠ Sin ubicación: {no_location_count} trabajadores'
                 )
             )
             if detailed:
                 for worker in no_location[:5]:
-                    self.stdout.write(f'  - {worker.user.email}')
+                    lines.append(f'  - {worker.user.email}')
         else:
-            self.stdout.write(self.style.SUCCESS('✓ Todos tienen ubicación'))
+            lines.append(self.style.SUCCESS('✓ Todos tienen ubicación'))
         
-        self.stdout.write(
+        lines.append(
             self.style.SUCCESS(f'✓ Con ubicación: {with_location_count} trabajadores')
         )
+        
+        return '\n'.join(lines)
     
-    def _analyze_professions(self):
+    def _analyze_professions(self) -> str:
         """Analiza distribución de profesiones."""
-        self.stdout.write(self.style.HTTP_INFO('\n👷 Distribución de Profesiones:'))
-        self.stdout.write('-' * 70)
+        lines = [self.style.HTTP_INFO('\n👷 Distribución de Profesiones:'), '-' * 70]
         
         professions = WorkerProfile.objects.filter(
-            user__is_active=True
+            is_active=True
         ).values(
             'profession'
         ).annotate(
             count=Count('id')
         ).order_by('-count')
         
+        profession_names = dict(WorkerProfile.ProfessionChoices.choices)
         for prof in professions:
-            profession_name = dict(WorkerProfile.ProfessionChoices.choices).get(
-                prof['profession'], prof['profession']
-            )
-            bar = '█' * (prof['count'] // 2)
-            self.stdout.write(f'  {profession_name:20} | {bar} {prof["count"]}')
+            profession_name = profession_names.get(prof['profession'], prof['profession'])
+            bar = MAX_BAR[:prof['count'] // 2]
+            lines.append(f'  {profession_name:20} | {bar} {prof["count"]}')
+        
+        return '\n'.join(lines)
     
-    def _analyze_ratings(self):
+    def _analyze_ratings(self) -> str:
         """Analiza estadísticas de ratings."""
-        self.stdout.write(self.style.HTTP_INFO('\n⭐ Estadísticas de Ratings:'))
-        self.stdout.write('-' * 70)
+        lines = [self.style.HTTP_INFO('\n⭐ Estadísticas de Ratings:'), '-' * 70]
         
         from django.db.models import Avg, Min, Max
         
         stats = WorkerProfile.objects.filter(
-            user__is_active=True
+            is_active=True
         ).aggregate(
             avg=Avg('average_rating'),
             min=Min('average_rating'),
@@ -212,88 +335,78 @@ class Command(BaseCommand):
         
         no_rating = WorkerProfile.objects.filter(
             average_rating=0,
-            user__is_active=True
+            is_active=True
         ).count()
         
-        self.stdout.write(f'  Rating promedio: {stats["avg"]:.2f}')
-        self.stdout.write(f'  Rating mínimo: {stats["min"]:.2f}')
-        self.stdout.write(f'  Rating máximo: {stats["max"]:.2f}')
+        lines.append(f'  Rating promedio: {stats["avg"]:.2f}')
+        lines.append(f'  Rating mínimo: {stats["min"]:.2f}')
+        lines.append(f'  Rating máximo: {stats["max"]:.2f}')
         
         if no_rating > 0:
-            self.stdout.write(
+            lines.append(
                 self.style.WARNING(f'  ⚠ Sin rating: {no_rating} trabajadores')
             )
+        
+        return '\n'.join(lines)
     
-    def _quality_summary(self):
+    def _quality_summary(self) -> str:
         """Resumen de calidad general."""
-        self.stdout.write(self.style.WARNING('\n' + '='*70))
-        self.stdout.write(self.style.WARNING('📊 Resumen de Calidad del Corpus'))
-        self.stdout.write(self.style.WARNING('='*70))
-        
-        active_workers = WorkerProfile.objects.filter(user__is_active=True)
-        total = active_workers.count()
+        lines = [
+            self.style.WARNING('\n' + '='*70),
+            self.style.WARNING('📊 Resumen de Calidad del Corpus'),
+            self.style.WARNING('='*70),
+        ]
         
-        # Trabajadores "listos para ML"
-        ml_ready = active_workers.extra(
-            where=[f"LENGTH(bio) >= {self.MIN_BIO_LENGTH}"]
-        ).filter(
-            location__isnull=False
-        ).count()
+        # Una sola pasada: conteos + clasificación de calidad resuelta en SQL (CASE)
+        total_count = Count('id')
+        ml_ready_count = Count(
+            'id', filter=Q(bio_length__gte=self.MIN_BIO_LENGTH, is_geolocated=True)
+        )
+        stats = WorkerProfile.objects.filter(
+            is_active=True
+        ).annotate(
+            bio_length=Length('bio')
+        ).aggregate(
+            total=total_count,
+            ml_ready=ml_ready_count,
+            needs_bio=Count('id', filter=Q(bio='') | Q(bio__isnull=True)),
+            needs_location=Count('id', filter=Q(is_geolocated=False)),
+            status=Case(
+                When(GreaterThanOrEqual(ml_ready_count * 100, total_count * 80), then=Value('excellent')),
+                When(GreaterThanOrEqual(ml_ready_count * 100, total_count * 60), then=Value('acceptable')),
+                default=Value('poor'),
+                output_field=CharField(),
+            ),
+        )
+        total = stats['total']
+        ml_ready = stats['ml_ready']
         
         if total > 0:
             percentage = (ml_ready / total) * 100
             
-            self.stdout.write(f'\nTrabajadores listos para ML: {ml_ready}/{total} ({percentage:.1f}%)')
+            lines.append(f'\nTrabajadores listos para ML: {ml_ready}/{total} ({percentage:.1f}%)')
             
-            if percentage >= 80:
-                self.stdout.write(
-                    self.style.SUCCESS('✓ Corpus en excelente estado para entrenar modelo')
-                )
-            elif percentage >= 60:
-                self.stdout.write(
-                    self.style.WARNING('⚠ Corpus aceptable, pero se recomienda mejorar datos')
-                )
-            else:
-                self.stdout.write(
-                    self.style.ERROR('✗ Corpus necesita mejoras significativas')
-                )
+            style_name, message = self.QUALITY_STATUS_MESSAGES[stats['status']]
+            lines.append(getattr(self.style, style_name)(message))
             
             # Recomendaciones
             if ml_ready < total:
-                self.stdout.write('\n📌 Recomendaciones:')
-                
-                needs_bio = active_workers.filter(
-                    Q(bio='') | Q(bio__isnull=True)
-                ).count()
+                lines.append('\n📌 Recomendaciones:')
                 
-                needs_location = active_workers.filter(
-                    location__isnull=True
-                ).count()
+                needs_bio = stats['needs_bio']
+                needs_location = stats['needs_location']
                 
                 if needs_bio > 0:
-                    self.stdout.write(f'  - Agregar biografías a {needs_bio} trabajadores')
-                    self.stdout.write('    Usa: python manage.py validate_corpus --fix-empty')
+                    lines.append(f'  - Agregar biografías a {needs_bio} trabajadores')
+                    lines.append('    Usa: python manage.py validate_corpus --fix-empty')
                 
                 if needs_location > 0:
-                    self.stdout.write(f'  - Agregar ubicación a {needs_location} trabajadores')
+                    lines.append(f'  - Agregar ubicación a {needs_location} trabajadores')
+        
+        lines.append('\n' + '='*70)
         
-        self.stdout.write('\n' + '='*70)
+        return '\n'.join(lines)
     
     def _generate_basic_bio(self, worker: WorkerProfile) -> str:
         """Genera una biografía básica para un trabajador."""
-        profession = worker.get_profession_display()
-        years = worker.years_experience
-        
-        bio_parts = [
-            f"Profesional {profession.lower()} especializado en servicios de calidad.",
-        ]
-        
-        if years > 0:
-            bio_parts.append(f"Cuento con {years} años de experiencia en el rubro.")
-        
-        bio_parts.append(
-            "Ofrezco atención personalizada y trabajo garantizado. "
-            "Disponible para presupuestos sin compromiso."
-        )
-        
-        return ' '.join(bio_parts)
+        return _bio_for(worker.profession, worker.years_experience)
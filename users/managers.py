@@ -1,4 +1,6 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
+from django.db.models import Avg, Case, F, FloatField, Value, When
 from django.utils.translation import gettext_lazy as _
 
 class CustomUserManager(BaseUserManager):
@@ -20,3 +22,78 @@ class CustomUserManager(BaseUserManager):
         if extra_fields.get('is_staff') is not True:
             raise ValueError(_('Superuser debe tener is_staff=True.'))
         return self.create_user(email, password, **extra_fields)
+
+    def bulk_create_with_profiles(self, users, batch_size=None):
+        """
+        Crea muchos usuarios y los WorkerProfile de los WORKER en dos INSERT.
+        
+        Para importaciones masivas: bulk_create no dispara post_save, así que
+        los perfiles se crean aquí en un solo INSERT en lugar de uno por
+        usuario desde el signal create_worker_profile. Los usuarios deben
+        llegar sin guardar y con la contraseña ya asignada (set_password).
+        
+        Returns:
+            Lista de usuarios creados (con pk asignado)
+        """
+        from django.db import transaction
+        from .models import WorkerProfile
+        from .services.dashboard_service import DashboardService
+
+        for user in users:
+            user.email = self.normalize_email(user.email)
+
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create(users, batch_size=batch_size)
+            # Los signals pre_save de WorkerProfile tampoco se disparan: se
+            # inicializan aquí las columnas desnormalizadas
+            WorkerProfile.objects.bulk_create(
+                [
+                    WorkerProfile(user=user, is_active=user.is_active, is_geolocated=False)
+                    for user in created
+                    if user.role == 'WORKER'
+                ],
+                batch_size=batch_size,
+            )
+
+        DashboardService.invalidate_cache()
+        return created
+
+
+class RecommendationLogQuerySet(models.QuerySet):
+    def with_rr(self):
+        """
+        Anota cada log con su Reciprocal Rank (`rr`) calculado en la base de datos.
+        
+        Equivalente a RecommendationLog.reciprocal_rank, pero permite obtener
+        el MRR con un único `aggregate(Avg('rr'))` en lugar de iterar en Python.
+        """
+        return self.annotate(
+            rr=Case(
+                When(click_position__isnull=True, then=Value(0.0)),
+                default=1.0 / (F('click_position') + 1.0),
+                output_field=FloatField(),
+            )
+        )
+    
+    def feedback_metrics(self) -> dict:
+        """
+        Calcula CTR, MRR y tasa de conversión en una sola consulta agregada.
+        
+        No instancia modelos ni carga las FKs a WorkerProfile: para trabajos de
+        métricas sobre muchos logs preferir esto (o values_list con las columnas
+        click_position / worker_clicked_id / worker_hired_id) a iterar objetos.
+        """
+        metrics = self.with_rr().aggregate(
+            ctr=Avg(Case(
+                When(worker_clicked__isnull=False, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )),
+            mrr=Avg('rr'),
+            conversion_rate=Avg(Case(
+                When(worker_hired__isnull=False, then=Value(1.0)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )),
+        )
+        return {key: value or 0.0 for key, value in metrics.items()}
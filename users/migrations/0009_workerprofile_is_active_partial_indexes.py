@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-16 09:12
+
+from django.db import migrations, models
+
+
+def backfill_is_active(apps, schema_editor):
+    """Copia user.is_active a la columna desnormalizada de WorkerProfile."""
+    WorkerProfile = apps.get_model('users', 'WorkerProfile')
+    WorkerProfile.objects.filter(user__is_active=False).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_add_contact_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerprofile',
+            name='is_active',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Active'),
+        ),
+        migrations.RunPython(backfill_is_active, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='workerprofile',
+            index=models.Index(condition=models.Q(('is_active', True), ('location__isnull', True)), fields=['user'], name='wp_active_noloc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerprofile',
+            index=models.Index(condition=models.Q(('is_active', True), models.Q(('bio', ''), ('bio__isnull', True), _connector='OR')), fields=['user'], name='wp_active_nobio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerprofile',
+            index=models.Index(condition=models.Q(('is_active', True), ('average_rating', 0)), fields=['user'], name='wp_active_norating_idx'),
+        ),
+    ]
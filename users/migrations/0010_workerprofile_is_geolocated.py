@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-16 09:40
+
+from django.db import migrations, models
+
+
+def backfill_is_geolocated(apps, schema_editor):
+    """Marca como geolocalizados los perfiles que ya tienen ubicación."""
+    WorkerProfile = apps.get_model('users', 'WorkerProfile')
+    WorkerProfile.objects.filter(location__isnull=False).update(is_geolocated=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_workerprofile_is_active_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workerprofile',
+            name='is_geolocated',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Geolocated'),
+        ),
+        migrations.RunPython(backfill_is_geolocated, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='workerprofile',
+            name='wp_active_noloc_idx',
+        ),
+        migrations.AddIndex(
+            model_name='workerprofile',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_geolocated', False)), fields=['user'], name='wp_active_noloc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerprofile',
+            index=models.Index(fields=['is_geolocated', 'user'], name='wp_geolocated_user_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-16 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_workerprofile_is_geolocated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recommendationlog',
+            index=models.Index(condition=models.Q(('worker_clicked__isnull', False)), fields=['-created_at'], name='reclog_clicked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendationlog',
+            index=models.Index(fields=['strategy_used', 'click_position'], name='reclog_strategy_click_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-16 11:20
+
+from django.db import migrations, models
+
+
+def mark_existing_as_compressed(apps, schema_editor):
+    """Los items existentes se comprimieron de forma síncrona al subirse."""
+    PortfolioItem = apps.get_model('users', 'PortfolioItem')
+    PortfolioItem.objects.update(is_compressed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_recommendationlog_feedback_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolioitem',
+            name='is_compressed',
+            field=models.BooleanField(default=False, editable=False, help_text='Falso mientras la imagen original espera la compresión diferida', verbose_name='Imagen Comprimida'),
+        ),
+        migrations.RunPython(mark_existing_as_compressed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-16 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_portfolioitem_is_compressed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recommendationlog',
+            index=models.Index(condition=models.Q(('worker_hired__isnull', False)), fields=['-created_at'], name='reclog_hired_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendationlog',
+            index=models.Index(fields=['strategy_used', 'worker_clicked'], name='reclog_strategy_clk_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-16 12:20
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_recommendationlog_hired_strategy_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recommendationlog',
+            name='top_worker_ids_array',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=50),
+        ),
+        # jsonb -> bigint[] preservando el orden (ALTER COLUMN ... USING no admite subconsultas)
+        migrations.RunSQL(
+            sql="""
+                UPDATE users_recommendationlog
+                SET top_worker_ids_array = ARRAY(
+                    SELECT elem::bigint
+                    FROM jsonb_array_elements_text(top_worker_ids) WITH ORDINALITY AS t(elem, ord)
+                    ORDER BY ord
+                );
+            """,
+            reverse_sql="""
+                UPDATE users_recommendationlog
+                SET top_worker_ids = to_jsonb(top_worker_ids_array);
+            """,
+        ),
+        migrations.RemoveField(
+            model_name='recommendationlog',
+            name='top_worker_ids',
+        ),
+        migrations.RenameField(
+            model_name='recommendationlog',
+            old_name='top_worker_ids_array',
+            new_name='top_worker_ids',
+        ),
+        migrations.AlterField(
+            model_name='recommendationlog',
+            name='top_worker_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, help_text='Lista de IDs de trabajadores recomendados en orden', size=50, verbose_name='IDs de Top Trabajadores'),
+        ),
+        migrations.AddIndex(
+            model_name='recommendationlog',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['top_worker_ids'], name='reclog_topw_gin'),
+        ),
+    ]
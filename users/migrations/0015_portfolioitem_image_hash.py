@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-16 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_recommendationlog_top_worker_ids_array'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolioitem',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='BLAKE2b de la imagen original, para reutilizar subidas idénticas', max_length=64, verbose_name='Hash de Imagen'),
+        ),
+    ]
@@ -1,11 +1,17 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
-from .managers import CustomUserManager
+from .managers import CustomUserManager, RecommendationLogQuerySet
 from django.contrib.gis.db import models as geomodels
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 class User(AbstractBaseUser, PermissionsMixin):
     class Role(models.TextChoices):
         ADMIN = "ADMIN", _("Administrator")
@@ -59,12 +65,75 @@ class WorkerProfile(models.Model):
     years_experience = models.PositiveIntegerField(_("Years of Experience"), default=0)
     hourly_rate = models.DecimalField(_("Hourly Rate"), max_digits=10, decimal_places=2, null=True, blank=True)
     location = geomodels.PointField(_("Location"), null=True, blank=True, srid=4326) 
+    # Bandera mantenida en pre_save (signals.py): evita leer la geometría en los NULL-checks
+    is_geolocated = models.BooleanField(_("Geolocated"), default=False, db_index=True, editable=False)
     is_verified = models.BooleanField(_("Verified"), default=False)
     average_rating = models.DecimalField(_("Average Rating"), max_digits=3, decimal_places=2, default=0.0)
+    # Copia desnormalizada de user.is_active (sincronizada en signals.py) para que
+    # los índices parciales no dependan del JOIN con la tabla de usuarios.
+    # Solo se sincroniza en el post_save de User: QuerySet.update() y bulk_update
+    # sobre User.is_active la dejan desfasada (reparar con
+    # `validate_corpus --fix-active`). Lo que se muestra a usuarios filtra por
+    # user__is_active; esta columna es para estadísticas e índices.
+    is_active = models.BooleanField(_("Active"), default=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Índices parciales alineados a los predicados de validate_corpus
+            models.Index(
+                fields=['user'],
+                condition=Q(is_active=True, is_geolocated=False),
+                name='wp_active_noloc_idx',
+            ),
+            models.Index(
+                fields=['user'],
+                condition=Q(is_active=True) & (Q(bio='') | Q(bio__isnull=True)),
+                name='wp_active_nobio_idx',
+            ),
+            models.Index(
+                fields=['user'],
+                condition=Q(is_active=True, average_rating=0),
+                name='wp_active_norating_idx',
+            ),
+            models.Index(fields=['is_geolocated', 'user'], name='wp_geolocated_user_idx'),
+        ]
+
+    # Campos que alimentan el modelo de recomendación (texto TF-IDF y worker_meta)
+    RECOMMENDATION_FIELDS = ('bio', 'profession', 'average_rating', 'location', 'is_active')
 
     def __str__(self):
         return f"Perfil de {self.user.email}"
 
+    def save(self, **kwargs):
+        # is_geolocated se deriva de location en pre_save: un save parcial que
+        # escribe location debe escribir también la bandera (pre_save recibe
+        # update_fields como frozenset y no puede ampliarlo)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'location' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'is_geolocated'}
+        super().save(**kwargs)
+
+    def recommendation_fields_changed(self, update_fields=None):
+        """
+        Indica si el save en curso cambia algún campo que usa el modelo de
+        recomendación. Se llama en pre_save (signals.py), nunca en lecturas.
+        
+        Con update_fields basta la intersección con RECOMMENDATION_FIELDS; sin
+        ellos se compara contra la fila guardada (una query por save). Los
+        campos diferidos que no se asignaron no cambiaron y no se comparan.
+        """
+        if update_fields is not None:
+            return not set(update_fields).isdisjoint(self.RECOMMENDATION_FIELDS)
+        if self._state.adding:
+            return True
+        loaded = [name for name in self.RECOMMENDATION_FIELDS if name in self.__dict__]
+        if not loaded:
+            return False
+        stored = type(self).objects.filter(pk=self.pk).values(*loaded).first()
+        if stored is None:
+            return True
+        return any(stored[name] != getattr(self, name) for name in loaded)
+
 
 class RecommendationLog(models.Model):
     """
@@ -112,9 +181,11 @@ class RecommendationLog(models.Model):
     
     # Resultados
     results_count = models.PositiveIntegerField(_("Cantidad de Resultados"), default=0)
-    top_worker_ids = models.JSONField(
-        _("IDs de Top Trabajadores"),
+    top_worker_ids = ArrayField(
+        models.BigIntegerField(),
+        verbose_name=_("IDs de Top Trabajadores"),
         default=list,
+        size=50,
         help_text="Lista de IDs de trabajadores recomendados en orden"
     )
     
@@ -155,6 +226,8 @@ class RecommendationLog(models.Model):
     user_latitude = models.FloatField(_("Latitud del Usuario"), null=True, blank=True)
     user_longitude = models.FloatField(_("Longitud del Usuario"), null=True, blank=True)
     
+    objects = RecommendationLogQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _("Log de Recomendación")
         verbose_name_plural = _("Logs de Recomendaciones")
@@ -163,11 +236,37 @@ class RecommendationLog(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['strategy_used', '-created_at']),
             models.Index(fields=['user', '-created_at']),
+            # Feedback loop: reportes de MRR/CTR solo recorren logs con click
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(worker_clicked__isnull=False),
+                name='reclog_clicked_idx',
+            ),
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(worker_hired__isnull=False),
+                name='reclog_hired_idx',
+            ),
+            models.Index(fields=['strategy_used', 'click_position'], name='reclog_strategy_click_idx'),
+            # A/B testing: CTR por estrategia
+            models.Index(fields=['strategy_used', 'worker_clicked'], name='reclog_strategy_clk_idx'),
+            # Apariciones de un trabajador en resultados: top_worker_ids__contains=[id]
+            GinIndex(fields=['top_worker_ids'], name='reclog_topw_gin'),
         ]
     
     def __str__(self):
         return f"Query: '{self.query[:50]}' - {self.strategy_used} ({self.created_at})"
     
+    @classmethod
+    def bulk_metrics(cls, since) -> dict:
+        """
+        Métricas agregadas (ctr, mrr, conversion_rate) de los logs desde `since`.
+        
+        Versión en una sola consulta de las properties ctr / reciprocal_rank /
+        conversion_rate, para reportes sobre muchos logs.
+        """
+        return cls.objects.filter(created_at__gte=since).feedback_metrics()
+    
     @property
     def ctr(self) -> float:
         """
@@ -200,6 +299,8 @@ class RecommendationLog(models.Model):
         
         Returns:
             Reciprocal rank value
+        
+        Para agregados sobre muchos logs usar RecommendationLog.objects.with_rr().
         """
         if self.click_position is not None:
             return 1.0 / (self.click_position + 1)
@@ -213,15 +314,60 @@ class RecommendationLog(models.Model):
 from .validators import portfolio_image_validators
 from .constants import (
     MAX_IMAGE_WIDTH,
+    MAX_IMAGE_PIXELS,
+    ALLOWED_IMAGE_FORMATS,
     IMAGE_QUALITY_JPEG,
     IMAGE_QUALITY_PNG_OPTIMIZE,
     IMAGE_QUALITY_WEBP,
+    IMAGE_WEBP_METHOD,
     DEFAULT_IMAGE_FORMAT,
     DEFAULT_IMAGE_EXTENSION,
+    IMAGE_SPOOL_MAX_BYTES,
 )
-from io import BytesIO
+import hashlib
+import io
+import os
+from tempfile import SpooledTemporaryFile
 from PIL import Image as PILImage
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+
+
+class _SpooledImageBuffer(SpooledTemporaryFile):
+    """
+    Buffer de salida para imágenes comprimidas: en memoria hasta max_size,
+    luego se vuelca a un archivo temporal.
+    
+    Oculta fileno(): Pillow lo llama al codificar y eso forzaría el volcado
+    a disco incluso para imágenes pequeñas.
+    """
+    
+    def fileno(self):
+        raise io.UnsupportedOperation("fileno")
+
+
+# Formato de salida → (kwargs de Image.save, extensión). Formatos desconocidos
+# se guardan como DEFAULT_IMAGE_FORMAT (WebP conserva el canal alfa).
+# JPEG progresivo + 4:2:0: archivos ~5-10% más pequeños sin costo de decodificación
+_JPEG_SAVE = (
+    {
+        "format": "JPEG",
+        "optimize": True,
+        "progressive": True,
+        "quality": IMAGE_QUALITY_JPEG,
+        "subsampling": 2,
+    },
+    "jpg",
+)
+_FORMAT_TABLE = {
+    "JPEG": _JPEG_SAVE,
+    "JPG": _JPEG_SAVE,
+    "PNG": ({"format": "PNG", "optimize": IMAGE_QUALITY_PNG_OPTIMIZE}, "png"),
+    "WEBP": (
+        {"format": "WEBP", "quality": IMAGE_QUALITY_WEBP, "method": IMAGE_WEBP_METHOD},
+        DEFAULT_IMAGE_EXTENSION,
+    ),
+}
 
 
 def portfolio_image_upload_to(instance, filename):
@@ -234,56 +380,126 @@ def portfolio_image_upload_to(instance, filename):
     return f"portfolio/worker_{instance.worker.id}/{filename}"
 
 
-def compress_image(image, format_hint=None):
+def _compress_pil(img, img_format):
     """
-    Comprime y redimensiona imagen usando Pillow.
+    Comprime y redimensiona una imagen PIL ya abierta.
     
     Aplica compresión inteligente:
     - Redimensiona si width > MAX_IMAGE_WIDTH (mantiene aspect ratio)
     - Optimiza calidad según formato
-    - Convierte a formatos web-friendly
+    - Conserva el formato de origen (JPEG, PNG, WebP); solo un formato
+      desconocido se guarda como DEFAULT_IMAGE_FORMAT
+    
+    Returns:
+        Tupla (File, extensión)
+    """
+    save_kwargs, ext = _FORMAT_TABLE.get(img_format.upper(), _FORMAT_TABLE[DEFAULT_IMAGE_FORMAT])
+    
+    # Resize if needed (maintains aspect ratio). Con reducing_gap, Pillow hace
+    # primero un reduce() entero (promedio por bloques) y aplica Lanczos solo
+    # sobre la imagen intermedia, mucho más pequeña
+    if img.width > MAX_IMAGE_WIDTH:
+        img.thumbnail(
+            (MAX_IMAGE_WIDTH, img.height),
+            PILImage.Resampling.LANCZOS,
+            reducing_gap=3.0,
+        )
+    
+    # Aplanar transparencia para JPEG (ya redimensionada: el fondo es más pequeño).
+    # Solo las imágenes con canal alfa real pasan por el composite
+    if save_kwargs["format"] == "JPEG":
+        if img.mode == "P":
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        if img.mode in ("RGBA", "LA"):
+            alpha = img.getchannel("A")
+            if alpha.getextrema()[0] == 255:
+                # Alfa totalmente opaco (capturas, PNG exportados): basta con descartarlo
+                img = img.convert("RGB")
+            else:
+                background = PILImage.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=alpha)
+                img = background
+    
+    buffer = _SpooledImageBuffer(max_size=IMAGE_SPOOL_MAX_BYTES)
+    img.save(buffer, **save_kwargs)
+    buffer.seek(0)
+    return File(buffer), ext
+
+
+def _open_image(image):
+    """
+    Abre la imagen probando solo los decoders permitidos y rechaza
+    dimensiones excesivas leyendo únicamente la cabecera.
     
     Raises:
-        ValidationError: Si el archivo no puede ser procesado por Pillow
+        ValidationError: Si el archivo no es JPEG/PNG/WebP válido o supera MAX_IMAGE_PIXELS
     """
     try:
-        img = PILImage.open(image)
-        img_format = format_hint or img.format or DEFAULT_IMAGE_FORMAT
-    except (IOError, OSError) as e:
+        img = PILImage.open(image, formats=ALLOWED_IMAGE_FORMATS)
+    except (IOError, OSError, PILImage.DecompressionBombError):
         raise ValidationError(
             _("El archivo no es una imagen válida o está corrupto.")
         )
     
-    # Convert RGBA to RGB for JPEG compatibility
-    if img.mode in ("RGBA", "LA", "P") and img_format.upper() in ["JPEG", "JPG"]:
-        background = PILImage.new("RGB", img.size, (255, 255, 255))
-        if img.mode == "P":
-            img = img.convert("RGBA")
-        background.paste(img, mask=img.split()[-1] if img.mode in ("RGBA", "LA") else None)
-        img = background
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            _("La imagen tiene demasiados píxeles para ser procesada.")
+        )
     
-    # Resize if needed (maintains aspect ratio)
-    if img.width > MAX_IMAGE_WIDTH:
-        ratio = MAX_IMAGE_WIDTH / float(img.width)
-        new_height = int(float(img.height) * ratio)
-        img = img.resize((MAX_IMAGE_WIDTH, new_height), PILImage.LANCZOS)
-    
-    buffer = BytesIO()
-    if img_format.upper() in ["JPEG", "JPG"]:
-        img.save(buffer, format="JPEG", optimize=True, quality=IMAGE_QUALITY_JPEG)
-        ext = "jpg"
-    elif img_format.upper() == "PNG":
-        img.save(buffer, format="PNG", optimize=IMAGE_QUALITY_PNG_OPTIMIZE)
-        ext = "png"
-    elif img_format.upper() == "WEBP":
-        img.save(buffer, format="WEBP", quality=IMAGE_QUALITY_WEBP)
-        ext = "webp"
-    else:
-        img.save(buffer, format="JPEG", optimize=True, quality=IMAGE_QUALITY_JPEG)
-        ext = DEFAULT_IMAGE_EXTENSION
+    return img
+
+
+def compress_image(image, format_hint=None):
+    """
+    Abre la imagen una sola vez y la comprime con _compress_pil.
     
-    buffer.seek(0)
-    return ContentFile(buffer.read()), ext
+    Para JPEG se usa draft() antes de decodificar, de modo que libjpeg
+    escala en el dominio DCT (1/2, 1/4, 1/8) cuando la imagen es mucho
+    más ancha que MAX_IMAGE_WIDTH.
+    
+    Raises:
+        ValidationError: Si el archivo no puede ser procesado por Pillow
+    """
+    img = _open_image(image)
+    img_format = format_hint or img.format or DEFAULT_IMAGE_FORMAT
+    
+    if img.format == "JPEG":
+        # Solo se restringe el ancho: el alto mínimo de 1px no limita la escala
+        img.draft("RGB", (MAX_IMAGE_WIDTH, 1))
+    
+    return _compress_pil(img, img_format)
+
+
+def hash_image(image):
+    """
+    Calcula el BLAKE2b (hex, 32 bytes) del contenido original de la imagen.
+    
+    Lee el archivo por chunks y lo deja posicionado al inicio.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    for chunk in image.chunks():
+        digest.update(chunk)
+    image.seek(0)
+    return digest.hexdigest()
+
+
+def verify_image(image):
+    """
+    Verifica que el archivo sea una imagen válida sin decodificar los píxeles.
+    
+    Raises:
+        ValidationError: Si el archivo no puede ser procesado por Pillow
+    """
+    try:
+        _open_image(image).verify()
+    except ValidationError:
+        raise
+    except Exception:
+        raise ValidationError(
+            _("El archivo no es una imagen válida o está corrupto.")
+        )
+    finally:
+        image.seek(0)
 
 
 class PortfolioItem(models.Model):
@@ -340,6 +556,20 @@ class PortfolioItem(models.Model):
         default=True,
         help_text=_("Indica si es un trabajo fuera de la plataforma")
     )
+    image_hash = models.CharField(
+        _("Hash de Imagen"),
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text=_("BLAKE2b de la imagen original, para reutilizar subidas idénticas")
+    )
+    is_compressed = models.BooleanField(
+        _("Imagen Comprimida"),
+        default=False,
+        editable=False,
+        help_text=_("Falso mientras la imagen original espera la compresión diferida")
+    )
     created_at = models.DateTimeField(
         _("Fecha de Creación"),
         auto_now_add=True
@@ -361,8 +591,35 @@ class PortfolioItem(models.Model):
         
         Aplica compresión solo si la imagen es nueva o cambió,
         reduciendo costos de almacenamiento y mejorando tiempos de carga.
+        
+        Con PORTFOLIO_DEFER_IMAGE_COMPRESSION activo solo se verifica la imagen
+        y se guarda el original; `compress_portfolio_images` la comprime después.
         """
-        if self.image and hasattr(self.image, "file"):
+        # Ediciones de metadatos (título, descripción...) no tocan la imagen
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "image" not in update_fields:
+            return super().save(*args, **kwargs)
+        
+        # _committed es False solo para archivos recién asignados (subidas nuevas)
+        if self.image and not self.image._committed:
+            self.image_hash = hash_image(self.image)
+            # Solo dentro del mismo trabajador: el archivo vive bajo
+            # portfolio/worker_<id>/ y no se comparte entre dueños
+            existing_image = PortfolioItem.objects.filter(
+                worker_id=self.worker_id, image_hash=self.image_hash, is_compressed=True
+            ).values_list("image", flat=True).first()
+            if existing_image:
+                # Imagen idéntica ya subida y comprimida por este trabajador:
+                # reutilizar el archivo almacenado
+                self.image = existing_image
+                self.is_compressed = True
+                return super().save(*args, **kwargs)
+            
+            if settings.PORTFOLIO_DEFER_IMAGE_COMPRESSION:
+                verify_image(self.image)
+                self.is_compressed = False
+                return super().save(*args, **kwargs)
+            
             try:
                 compressed_file, ext = compress_image(self.image)
                 
@@ -371,12 +628,11 @@ class PortfolioItem(models.Model):
                 
                 self.image = compressed_file
                 self.image.name = file_name
+                self.is_compressed = True
             except ValidationError:
                 # Re-propagar ValidationError (ej: imagen corrupta)
                 raise
             except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
                 logger.warning(f"Fallo compresión de imagen para PortfolioItem: {e}")
                 # Propagar como ValidationError para consistencia
                 raise ValidationError(
@@ -385,6 +641,26 @@ class PortfolioItem(models.Model):
         
         super().save(*args, **kwargs)
     
+    def compress_stored_image(self):
+        """
+        Comprime la imagen ya almacenada (modo diferido) y marca el item como comprimido.
+        
+        Reemplaza el archivo original por la versión comprimida y lo elimina del storage.
+        Las subidas idénticas solo reutilizan archivos ya comprimidos (y del mismo
+        trabajador), así que el original no está compartido con otros items.
+        """
+        original_name = self.image.name
+        with self.image.open("rb") as stored:
+            compressed_file, ext = compress_image(stored)
+        
+        base_name = os.path.basename(original_name).rsplit(".", 1)[0]
+        self.image.save(f"{base_name}.{ext}", compressed_file, save=False)
+        self.is_compressed = True
+        super().save(update_fields=["image", "is_compressed"])
+        
+        if self.image.name != original_name:
+            self.image.storage.delete(original_name)
+    
     def __str__(self):
         return f"{self.worker.user.email} - {self.title}"
 
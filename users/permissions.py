@@ -7,6 +7,22 @@ Sigue el principio Open/Closed: fácil de extender sin modificar.
 
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from .models import WorkerProfile
+
+
+def is_worker_owner(obj, user):
+    """
+    Indica si `user` es el trabajador dueño de `obj` (objeto con FK `worker`).
+    
+    Si el worker ya está cargado (select_related en la vista) no hace consultas;
+    si no, usa una sola consulta EXISTS sobre worker_id en lugar de cargar
+    el WorkerProfile completo.
+    """
+    worker = obj._state.fields_cache.get("worker")
+    if worker is not None:
+        return worker.user_id == user.id
+    return WorkerProfile.objects.filter(pk=obj.worker_id, user_id=user.id).exists()
+
 
 class IsWorkerAndOwnerOrReadOnly(BasePermission):
     """
@@ -42,7 +58,7 @@ class IsWorkerAndOwnerOrReadOnly(BasePermission):
             return True
         
         if user.role == "WORKER":
-            return obj.worker.user_id == user.id
+            return is_worker_owner(obj, user)
         
         return False
 
@@ -68,4 +84,4 @@ class IsWorkerOwner(BasePermission):
         if user.role == "ADMIN" or user.is_superuser:
             return True
         
-        return obj.worker.user_id == user.id
+        return is_worker_owner(obj, user)
@@ -1,20 +1,72 @@
+import functools
+import math
+
 from rest_framework import serializers
+from rest_framework.fields import flatten_choices_dict, to_choices_dict
 from django.contrib.auth import get_user_model
 from .models import WorkerProfile, RecommendationLog
+from .constants import DEFAULT_MAX_DISTANCE_KM, KM_PER_DEGREE_LAT
 from django.contrib.gis.geos import Point
+from django.db.models import Count
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+
+def _make_point(lng, lat):
+    """Construye un Point WGS84 (srid=4326) a partir de coordenadas ya validadas."""
+    return Point(lng, lat, srid=4326)
+
+
+class CachedReadableFieldsMixin:
+    """
+    Cachea la lista de campos legibles del serializer.
+    
+    DRF recalcula _readable_fields (generador sobre fields) en cada
+    to_representation; con many=True el hijo es una única instancia,
+    así que la lista se construye una sola vez para todas las filas.
+    """
+    
+    @cached_property
+    def _readable_fields(self):
+        return [field for field in self.fields.values() if not field.write_only]
+
+
+@functools.lru_cache(maxsize=None)
+def _choice_maps(choices):
+    """Construye (grouped_choices, choices, choice_strings_to_values) una sola vez por set de choices."""
+    grouped_choices = to_choices_dict(choices)
+    flat_choices = flatten_choices_dict(grouped_choices)
+    return grouped_choices, flat_choices, {str(key): key for key in flat_choices}
+
+
+class FrozenChoiceField(serializers.ChoiceField):
+    """
+    ChoiceField para sets de choices fijos (enums).
+    
+    DRF copia los campos declarados en cada instanciación del serializer y
+    ChoiceField reconstruye sus diccionarios de choices cada vez; aquí se
+    reutilizan los mapas cacheados por _choice_maps.
+    """
+    
+    def _set_choices(self, choices):
+        self.grouped_choices, self._choices, self.choice_strings_to_values = _choice_maps(
+            tuple(choices)
+        )
+    
+    choices = property(serializers.ChoiceField._get_choices, _set_choices)
+
+
+class UserSerializer(CachedReadableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = [
+        fields = (
             'id', 'email', 'first_name', 'last_name', 'role', 'avatar',
             'phone_number', 'address', 'city', 'state', 'country', 'postal_code'
-        ]
-        read_only_fields = ['id', 'role', 'email']
+        )
+        read_only_fields = ('id', 'role', 'email')
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -22,13 +74,24 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ['email', 'password', 'first_name', 'last_name', 'role', 'worker_profile'] 
+        fields = ('email', 'password', 'first_name', 'last_name', 'role', 'worker_profile')
 
     def get_worker_profile(self, obj):
-        """Retorna el ID del worker profile si el usuario es WORKER"""
-        if obj.role == 'WORKER' and hasattr(obj, 'worker_profile'):
+        """
+        Retorna el ID del worker profile si el usuario es WORKER.
+        
+        Usa el perfil ya cargado (select_related / signal de creación) cuando
+        existe, y solo consulta la base de datos para usuarios WORKER.
+        """
+        cached = obj._state.fields_cache.get('worker_profile')
+        if cached is not None:
+            return cached.id
+        if obj.role != 'WORKER':
+            return None
+        try:
             return obj.worker_profile.id
-        return None
+        except WorkerProfile.DoesNotExist:
+            return None
 
     def create(self, validated_data):
         user = User.objects.create_user(
@@ -60,7 +123,8 @@ class WorkerProfileUpdateSerializer(serializers.ModelSerializer):
         lng = validated_data.pop('longitude', None)
 
         if lat is not None and lng is not None:
-            instance.location = Point(float(lng), float(lat), srid=4326)
+            # FloatField ya entrega floats validados
+            instance.location = _make_point(lng, lat)
         
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -68,10 +132,13 @@ class WorkerProfileUpdateSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class WorkerProfileSerializer(serializers.ModelSerializer):
+class WorkerProfileSerializer(CachedReadableFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True) 
-    latitude = serializers.SerializerMethodField()
-    longitude = serializers.SerializerMethodField()
+    # Campos declarados (aparecen en el schema); GeoDjango deserializa la
+    # geometría una vez por instancia y ambos campos leen ese mismo objeto.
+    # Sin ubicación, location.y falla con AttributeError y se usa el default
+    latitude = serializers.FloatField(source='location.y', read_only=True, default=None)
+    longitude = serializers.FloatField(source='location.x', read_only=True, default=None)
 
     class Meta:
         model = WorkerProfile
@@ -89,12 +156,6 @@ class WorkerProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'is_verified', 'average_rating']
 
-    def get_latitude(self, obj):
-        return obj.location.y if obj.location else None
-
-    def get_longitude(self, obj):
-        return obj.location.x if obj.location else None
-
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     default_error_messages = {
         'no_active_account': _('No se encontró una cuenta activa con estas credenciales.')
@@ -109,6 +170,15 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 # SERIALIZERS DEL SISTEMA DE RECOMENDACIÓN (HU2)
 # ============================================================================
 
+# Mensajes de validación de RecommendationRequestSerializer
+_ERR_LATLNG_PAIR = "Latitude y longitude deben proporcionarse juntos"
+_ERR_DISTANCE_NEEDS_COORDS = "max_distance_km requiere latitude y longitude"
+_ERR_QUERY_SHORT = {'query': 'La búsqueda debe tener al menos 3 caracteres'}
+_ERR_LANGUAGE_UNSUPPORTED = {
+    'language': 'Inglés no soportado actualmente. Use "es" para español. Funcionalidad en desarrollo (HU3).'
+}
+
+
 class RecommendationRequestSerializer(serializers.Serializer):
     """
     Serializer para validar requests al endpoint de recomendaciones.
@@ -126,14 +196,14 @@ class RecommendationRequestSerializer(serializers.Serializer):
         help_text="Texto de búsqueda en lenguaje natural. Ej: 'Plomero urgente para reparar fuga'"
     )
     
-    language = serializers.ChoiceField(
-        choices=['es', 'en'],
+    language = FrozenChoiceField(
+        choices=('es', 'en'),
         default='es',
         help_text="Idioma de búsqueda: 'es' (español) o 'en' (inglés). Solo español soportado actualmente."
     )
     
-    strategy = serializers.ChoiceField(
-        choices=['tfidf', 'fallback', 'hybrid'],
+    strategy = FrozenChoiceField(
+        choices=('tfidf', 'fallback', 'hybrid'),
         default='tfidf',
         help_text="Estrategia de ranking: tfidf (ML puro), fallback (geo+rating), hybrid (combinado)"
     )
@@ -146,9 +216,7 @@ class RecommendationRequestSerializer(serializers.Serializer):
     )
     
     # Filtros opcionales
-    min_rating = serializers.DecimalField(
-        max_digits=3,
-        decimal_places=2,
+    min_rating = serializers.FloatField(
         min_value=0,
         max_value=5,
         required=False,
@@ -180,7 +248,7 @@ class RecommendationRequestSerializer(serializers.Serializer):
         help_text="Distancia máxima en kilómetros (solo si latitude/longitude están presentes)"
     )
     
-    profession = serializers.ChoiceField(
+    profession = FrozenChoiceField(
         choices=WorkerProfile.ProfessionChoices.choices,
         required=False,
         allow_null=True,
@@ -188,43 +256,57 @@ class RecommendationRequestSerializer(serializers.Serializer):
         help_text="Filtrar por profesión específica"
     )
     
+    flat_user = serializers.BooleanField(
+        default=False,
+        help_text="Si es true, los datos del usuario se devuelven como campos user_* planos en lugar del objeto 'user' anidado"
+    )
+    
+    include_details = serializers.BooleanField(
+        default=True,
+        help_text="Si es false, se omite 'recommendation_details' (solo campos planos de scoring)"
+    )
+    
     def validate(self, data):
         """
         Validación cruzada de campos.
         """
-        # Si hay latitude o longitude, ambos deben estar presentes
         lat = data.get('latitude')
         lng = data.get('longitude')
+        max_distance_km = data.get('max_distance_km')
         
-        if (lat is not None and lng is None) or (lng is not None and lat is None):
-            raise serializers.ValidationError(
-                "Latitude y longitude deben proporcionarse juntos"
-            )
+        # Si hay latitude o longitude, ambos deben estar presentes
+        if (lat is None) ^ (lng is None):
+            raise serializers.ValidationError(_ERR_LATLNG_PAIR)
         
         # Si hay max_distance_km, debe haber coordenadas
-        if data.get('max_distance_km') and (lat is None or lng is None):
-            raise serializers.ValidationError(
-                "max_distance_km requiere latitude y longitude"
-            )
+        if max_distance_km and lat is None:
+            raise serializers.ValidationError(_ERR_DISTANCE_NEEDS_COORDS)
         
-        # Limpiar query
-        query = data.get('query', '').strip()
-        if len(query) < 3:
-            raise serializers.ValidationError({
-                'query': 'La búsqueda debe tener al menos 3 caracteres'
-            })
+        # Bounding box (xmin, ymin, xmax, ymax) del radio de búsqueda: permite un
+        # prefiltro por índice GiST antes del cálculo exacto de distancia
+        if lat is not None:
+            dlat = (max_distance_km or DEFAULT_MAX_DISTANCE_KM) / KM_PER_DEGREE_LAT
+            dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+            if -180 <= lng - dlng and lng + dlng <= 180:
+                data['_bbox'] = (
+                    lng - dlng,
+                    max(lat - dlat, -90.0),
+                    lng + dlng,
+                    min(lat + dlat, 90.0),
+                )
         
-        # Validar idioma (solo español soportado por ahora)
-        language = data.get('language', 'es')
-        if language == 'en':
-            raise serializers.ValidationError({
-                'language': 'Inglés no soportado actualmente. Use "es" para español. Funcionalidad en desarrollo (HU3).'
-            })
+        # CharField ya recorta espacios (trim_whitespace), no hace falta strip()
+        if len(data['query']) < 3:
+            raise serializers.ValidationError(_ERR_QUERY_SHORT)
+        
+        # Validar idioma (solo español soportado por ahora; language tiene default)
+        if data['language'] == 'en':
+            raise serializers.ValidationError(_ERR_LANGUAGE_UNSUPPORTED)
         
         return data
 
 
-class WorkerRecommendationSerializer(serializers.ModelSerializer):
+class WorkerRecommendationSerializer(CachedReadableFieldsMixin, serializers.ModelSerializer):
     """
     Serializer para trabajadores recomendados con información adicional de scoring.
     
@@ -233,25 +315,34 @@ class WorkerRecommendationSerializer(serializers.ModelSerializer):
     """
     
     user = UserSerializer(read_only=True)
-    latitude = serializers.SerializerMethodField()
-    longitude = serializers.SerializerMethodField()
+    # Metadatos de RecommendationPresenter en worker._recommendation (RecommendationMeta)
+    # Coordenadas precalculadas (None sin ubicación)
+    latitude = serializers.FloatField(source='_recommendation.lat', read_only=True, default=None)
+    longitude = serializers.FloatField(source='_recommendation.lng', read_only=True, default=None)
     
     # Campos planos para compatibilidad con frontend
     recommendation_score = serializers.FloatField(
+        source='_recommendation.score',
         read_only=True, 
         help_text="Score normalizado de relevancia (0-1)"
     )
     matched_keywords = serializers.ListField(
+        source='_recommendation.matched_keywords',
         read_only=True, 
         help_text="Lista de palabras clave que coinciden con la búsqueda"
     )
     explanation = serializers.CharField(
+        source='_recommendation.explanation',
         read_only=True, 
         help_text="Explicación en texto de por qué se recomendó este trabajador"
     )
     
     # Campos detallados (backward compatibility)
-    recommendation_details = serializers.SerializerMethodField(
+    recommendation_details = serializers.DictField(
+        source='_recommendation.details',
+        read_only=True,
+        allow_null=True,
+        default=None,
         help_text="Información detallada del scoring (para análisis avanzado)"
     )
     
@@ -277,28 +368,19 @@ class WorkerRecommendationSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'is_verified', 'average_rating']
     
-    def get_latitude(self, obj):
-        return obj.location.y if obj.location else None
-    
-    def get_longitude(self, obj):
-        return obj.location.x if obj.location else None
-    
-    def get_recommendation_details(self, obj):
-        """
-        Retorna información detallada del scoring para análisis avanzado.
-        """
-        if not hasattr(obj, '_recommendation_data'):
-            return None
-        
-        data = obj._recommendation_data
-        return {
-            'semantic_similarity': data.get('score', 0),
-            'relevance_percentage': data.get('relevance_percentage', 0),
-            'distance_km': data.get('distance_km'),
-            'distance_factor': data.get('distance_factor'),
-            'normalized_score': data.get('normalized_score'),
-            'matched_terms_count': len(data.get('matched_keywords', [])),
-        }
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Con context['flat_user'] se evita el UserSerializer anidado por fila
+        if self.context.get('flat_user'):
+            fields = self.fields
+            fields.pop('user')
+            fields['user_id'] = serializers.IntegerField(read_only=True)
+            fields['user_first_name'] = serializers.CharField(source='user.first_name', read_only=True)
+            fields['user_last_name'] = serializers.CharField(source='user.last_name', read_only=True)
+            fields['user_avatar'] = serializers.ImageField(source='user.avatar', read_only=True)
+        # Sin context['include_details'] el dict de scoring detallado no se construye
+        if not self.context.get('include_details', True):
+            self.fields.pop('recommendation_details')
 
 
 class RecommendationResponseSerializer(serializers.Serializer):
@@ -320,6 +402,13 @@ class RecommendationResponseSerializer(serializers.Serializer):
     log_id = serializers.UUIDField(help_text="ID del log de esta recomendación", required=False)
 
 
+class TopTermSerializer(serializers.Serializer):
+    """Término de búsqueda con su número de apariciones."""
+    
+    term = serializers.CharField()
+    count = serializers.IntegerField()
+
+
 class RecommendationAnalyticsSerializer(serializers.Serializer):
     """
     Serializer para métricas y analytics del sistema de recomendación.
@@ -340,8 +429,8 @@ class RecommendationAnalyticsSerializer(serializers.Serializer):
     avg_mrr = serializers.FloatField(help_text="Mean Reciprocal Rank promedio")
     
     # Top queries
-    top_query_terms = serializers.ListField(
-        child=serializers.DictField(),
+    top_query_terms = TopTermSerializer(
+        many=True,
         help_text="Términos más buscados con conteo"
     )
     
@@ -364,8 +453,8 @@ class RecommendationHealthSerializer(serializers.Serializer):
     Serializer para health check del sistema de recomendación.
     """
     
-    status = serializers.ChoiceField(
-        choices=['ready', 'training', 'not_trained', 'degraded', 'unhealthy'],
+    status = FrozenChoiceField(
+        choices=('ready', 'training', 'not_trained', 'degraded', 'unhealthy'),
         help_text="Estado general del sistema: ready (listo), training (entrenando), not_trained (sin entrenar), degraded (degradado), unhealthy (no saludable)"
     )
     
@@ -383,8 +472,8 @@ class RecommendationHealthSerializer(serializers.Serializer):
     )
     
     # Estado de cache
-    cache_status = serializers.ChoiceField(
-        choices=['connected', 'disconnected', 'error'],
+    cache_status = FrozenChoiceField(
+        choices=('connected', 'disconnected', 'error'),
         help_text="Estado de la conexión a Redis"
     )
     cache_keys_count = serializers.IntegerField(
@@ -422,7 +511,27 @@ class RecommendationHealthSerializer(serializers.Serializer):
 from .models import PortfolioItem
 
 
-class PortfolioItemSerializer(serializers.ModelSerializer):
+class OrderInfoSerializer(CachedReadableFieldsMixin, serializers.Serializer):
+    """
+    Información básica de la orden relacionada a un item de portfolio.
+    
+    Incluye datos del cliente y estado para contexto. Los valores se leen
+    directamente de la orden (las vistas hacen select_related("order__client")).
+    """
+    
+    id = serializers.ReadOnlyField()
+    description = serializers.ReadOnlyField()
+    status = serializers.ReadOnlyField()
+    updated_at = serializers.ReadOnlyField()
+    
+    def to_representation(self, order):
+        data = super().to_representation(order)
+        client = order.client
+        data["client_name"] = f"{client.first_name} {client.last_name}".strip() or client.email
+        return data
+
+
+class PortfolioItemSerializer(CachedReadableFieldsMixin, serializers.ModelSerializer):
     """
     Serializador de lectura para items de portfolio.
     
@@ -434,7 +543,7 @@ class PortfolioItemSerializer(serializers.ModelSerializer):
     worker_user_id = serializers.IntegerField(source="worker.user.id", read_only=True)
     worker_email = serializers.EmailField(source="worker.user.email", read_only=True)
     image_url = serializers.SerializerMethodField()
-    order_info = serializers.SerializerMethodField()
+    order_info = OrderInfoSerializer(source="order", read_only=True)
     
     class Meta:
         model = PortfolioItem
@@ -450,6 +559,7 @@ class PortfolioItemSerializer(serializers.ModelSerializer):
             "order",
             "is_external_work",
             "order_info",
+            "is_compressed",
             "created_at",
         ]
         read_only_fields = [
@@ -461,6 +571,7 @@ class PortfolioItemSerializer(serializers.ModelSerializer):
             "image_url",
             "is_external_work",
             "order_info",
+            "is_compressed",
         ]
     
     def get_image_url(self, obj):
@@ -470,31 +581,16 @@ class PortfolioItemSerializer(serializers.ModelSerializer):
             request = self.context.get("request")
             
             if request is not None and not url.startswith("http"):
-                return request.build_absolute_uri(url)
+                # scheme://host se calcula una vez por respuesta (el context es
+                # compartido por todas las filas) en lugar de validar el host por item
+                prefix = self.context.get("_absolute_uri_prefix")
+                if prefix is None:
+                    prefix = self.context["_absolute_uri_prefix"] = request.build_absolute_uri("/")[:-1]
+                return prefix + url
             
             return url
         return None
     
-    def get_order_info(self, obj):
-        """
-        Retorna información básica de la orden si existe.
-        
-        Incluye datos del cliente y estado para contexto.
-        """
-        if obj.order:
-            # Construir nombre del cliente
-            client_name = f"{obj.order.client.first_name} {obj.order.client.last_name}".strip()
-            if not client_name:
-                client_name = obj.order.client.email
-            
-            return {
-                "id": obj.order.id,
-                "client_name": client_name,
-                "description": obj.order.description,
-                "status": obj.order.status,
-                "updated_at": obj.order.updated_at
-            }
-        return None
 
 
 class PortfolioItemCreateSerializer(serializers.ModelSerializer):
@@ -592,10 +688,18 @@ class WorkerProfileWithPortfolioSerializer(WorkerProfileSerializer):
     
     Usado para vistas detalladas donde el portfolio debe mostrarse
     junto con la información básica del trabajador.
+    
+    portfolio_count se lee de la anotación _portfolio_count: el queryset de
+    la vista debe pasar por setup_queryset() (un COUNT agregado en la misma
+    consulta en lugar de uno por trabajador).
     """
     
     portfolio_items = PortfolioItemSerializer(many=True, read_only=True)
-    portfolio_count = serializers.SerializerMethodField()
+    portfolio_count = serializers.IntegerField(
+        source="_portfolio_count",
+        read_only=True,
+        default=0,
+    )
     
     class Meta(WorkerProfileSerializer.Meta):
         fields = WorkerProfileSerializer.Meta.fields + [
@@ -603,9 +707,12 @@ class WorkerProfileWithPortfolioSerializer(WorkerProfileSerializer):
             "portfolio_count",
         ]
     
-    def get_portfolio_count(self, obj):
-        """Retorna cantidad total de items de portfolio."""
-        return obj.portfolio_items.count()
+    @staticmethod
+    def setup_queryset(queryset):
+        """Anota _portfolio_count y precarga los items de portfolio."""
+        return queryset.annotate(
+            _portfolio_count=Count("portfolio_items")
+        ).prefetch_related("portfolio_items")
 
 
 # ============================================================================
@@ -1,22 +1,101 @@
+import functools
+import os
 import re
 import logging
 import time
-from typing import List, Dict, Tuple, Optional
+import uuid
+from contextlib import contextmanager
+from typing import Iterable, List, Dict, Tuple, Optional
 from decimal import Decimal
 
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from django.conf import settings
 from django.core.cache import cache
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import Point, Polygon
 from django.contrib.gis.measure import D
 from django.db.models import Q
-import joblib
 
+from users.constants import DEFAULT_MAX_DISTANCE_KM, EARTH_RADIUS_KM
 from users.models import WorkerProfile
 
 logger = logging.getLogger(__name__)
 
+# Modelo deserializado por proceso: (ruta, versión) → payload (arrays en mmap)
+_LOADED_MODELS: Dict[Tuple[str, str], Dict] = {}
+
+# Locks en el cache compartido: escrituras del modelo y cola de perfiles pendientes
+_MODEL_LOCK_KEY = 'recommendation_model_lock'
+_PENDING_LOCK_KEY = 'recommendation_model_pending_lock'
+
+# IDs de WorkerProfile editados que esperan apply_pending_updates
+PENDING_UPDATES_KEY = 'recommendation_model_pending_updates'
+
+
+@contextmanager
+def _cache_lock(key: str, timeout: int, wait: float):
+    """
+    Lock entre procesos sobre el cache compartido.
+    
+    Usa cache.add (atómico en Redis y en los backends locales), así funciona
+    con cualquier CACHES. `timeout` libera el lock si el proceso muere.
+    
+    Raises:
+        TimeoutError: Si no se obtiene el lock en `wait` segundos
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait
+    while not cache.add(key, token, timeout):
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Lock {key} ocupado")
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        # Solo se libera si sigue siendo propio (pudo expirar y tomarlo otro)
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def _model_write_lock(wait: float = 30.0):
+    """Lock para leer-modificar-escribir el modelo persistido."""
+    return _cache_lock(_MODEL_LOCK_KEY, timeout=300, wait=wait)
+
+
+def _pending_lock():
+    """Lock corto para la cola de perfiles pendientes (se toma en el request)."""
+    return _cache_lock(_PENDING_LOCK_KEY, timeout=10, wait=2.0)
+
+
+def _haversine_km(lats: np.ndarray, lngs: np.ndarray, lat: float, lng: float) -> np.ndarray:
+    """
+    Distancia de gran círculo (km) desde (lat, lng) a cada punto, vectorizada.
+    """
+    lats, lngs = np.radians(lats), np.radians(lngs)
+    lat, lng = np.radians(lat), np.radians(lng)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _synonym_tokens(synonyms: Dict[str, List[str]], stopwords: frozenset) -> Dict[str, Tuple[str, ...]]:
+    """
+    Pre-tokeniza los sinónimos: palabra → tokens de expansión ya sin stopwords.
+    
+    Equivale a expandir con expand_synonyms() y luego filtrar stopwords,
+    pero se calcula una sola vez al definir la clase.
+    """
+    return {
+        word: tuple(
+            token
+            for synonym in expansions
+            for token in synonym.split()
+            if token not in stopwords
+        )
+        for word, expansions in synonyms.items()
+    }
+
 
 class RecommendationEngine:
     """
@@ -26,8 +105,10 @@ class RecommendationEngine:
     Attributes:
         cache_ttl (int): Tiempo de vida del cache en segundos (default: 24h)
         vectorizer (TfidfVectorizer): Vectorizador TF-IDF entrenado
-        tfidf_matrix (np.ndarray): Matriz TF-IDF de todos los trabajadores
+        tfidf_matrix (csr_array): Matriz TF-IDF de todos los trabajadores
         worker_ids (List[str]): Lista de IDs de trabajadores en orden de la matriz
+        _worker_id_to_idx (Dict[str, int]): ID de trabajador → fila de la matriz
+        worker_meta (np.ndarray): Rating, profesión y coordenadas por fila (filtros sin BD)
     
     Examples:
         >>> engine = RecommendationEngine()
@@ -49,7 +130,7 @@ class RecommendationEngine:
     
     # Stopwords personalizadas del dominio (además de las NLTK estándar)
     # ESPAÑOL
-    DOMAIN_STOPWORDS_ES = {
+    DOMAIN_STOPWORDS_ES = frozenset({
         # Genéricas del dominio
         'trabajo', 'servicio', 'experiencia', 'años', 'profesional',
         'atención', 'calidad', 'garantía', 'cliente', 'ofrezco',
@@ -63,10 +144,10 @@ class RecommendationEngine:
         
         # Términos de relleno
         'cuenta', 'dispone', 'además', 'también'
-    }
+    })
     
     # INGLÉS
-    DOMAIN_STOPWORDS_EN = {
+    DOMAIN_STOPWORDS_EN = frozenset({
         # Genéricas del dominio
         'work', 'service', 'experience', 'years', 'professional',
         'attention', 'quality', 'warranty', 'customer', 'client',
@@ -81,7 +162,7 @@ class RecommendationEngine:
         
         # Términos de relleno
         'also', 'available', 'additionally', 'furthermore'
-    }
+    })
     
     # Combinar stopwords de ambos idiomas
     DOMAIN_STOPWORDS = DOMAIN_STOPWORDS_ES | DOMAIN_STOPWORDS_EN
@@ -136,6 +217,26 @@ class RecommendationEngine:
     
     # Combinar sinónimos de ambos idiomas
     SYNONYMS = {**SYNONYMS_ES, **SYNONYMS_EN}
+    _SYNONYM_TOKENS = _synonym_tokens(SYNONYMS, DOMAIN_STOPWORDS)
+    
+    # Caracteres no permitidos (se conservan letras en inglés y español y espacios)
+    _RE_NONLETTER = re.compile(r'[^a-záéíóúñü\s]')
+    
+    # Palabras clave para detectar la profesión en una query (por subcadena).
+    # El orden importa: gana la primera profesión con alguna coincidencia
+    PROFESSION_KEYWORDS = {
+        'PLUMBER': ['plomero', 'fontanero', 'gasfiter', 'tubería', 'fuga'],
+        'ELECTRICIAN': ['electricista', 'luz', 'electricidad', 'cableado'],
+        'MASON': ['albañil', 'construcción', 'mampostería', 'obra'],
+        'PAINTER': ['pintor', 'pintura', 'barniz'],
+        'CARPENTER': ['carpintero', 'carpintería', 'madera', 'mueble'],
+    }
+    # Una alternación compilada por profesión: un solo escaneo en C del texto
+    # por profesión, en lugar de un `in` por palabra clave
+    _PROFESSION_PATTERNS = tuple(
+        (profession, re.compile('|'.join(map(re.escape, keywords))))
+        for profession, keywords in PROFESSION_KEYWORDS.items()
+    )
     
     # Pesos para estrategia híbrida (deben sumar 1.0)
     HYBRID_WEIGHTS = {
@@ -153,8 +254,23 @@ class RecommendationEngine:
         'sublinear_tf': True,        # Escala logarítmica para TF
         'strip_accents': 'unicode',  # Remover acentos
         'lowercase': True,
+        'norm': 'l2',                # Filas unitarias: coseno = producto punto
+        'dtype': np.float32,         # Precisión suficiente para rankear; mitad de memoria
     }
     
+    # Fracción máxima de términos fuera del vocabulario para actualizar una
+    # fila en update_worker; por encima, se reentrena el modelo completo
+    VOCABULARY_DRIFT_THRESHOLD = 0.5
+    
+    # Datos mínimos por fila del corpus para filtrar sin consultar la BD
+    # (lat/lng = NaN si el trabajador no tiene ubicación)
+    WORKER_META_DTYPE = np.dtype([
+        ('rating', 'f8'),
+        ('profession', f"U{WorkerProfile._meta.get_field('profession').max_length}"),
+        ('lat', 'f8'),
+        ('lng', 'f8'),
+    ])
+    
     def __init__(self, cache_ttl: int = 86400):
         """
         Inicializa el motor de recomendación.
@@ -166,41 +282,102 @@ class RecommendationEngine:
         self.vectorizer = None
         self.tfidf_matrix = None
         self.worker_ids = []
+        self._worker_id_to_idx = {}
+        self._feature_names = None
+        self.worker_meta = None
+        # Versión (en Redis) del modelo cargado en esta instancia
+        self._model_version = None
         
         # Intentar cargar modelo desde cache
         self._load_from_cache()
     
     def _load_from_cache(self) -> bool:
         """
-        Carga el modelo TF-IDF desde Redis cache.
+        Carga el modelo TF-IDF persistido con joblib.
+        
+        Redis solo guarda la ruta y la versión del archivo; los arrays se abren
+        con mmap_mode='r', así que los procesos del servidor comparten las
+        páginas del page cache en lugar de tener cada uno su copia. Cada
+        proceso deserializa una versión una sola vez (_LOADED_MODELS).
         
         Returns:
             True si se cargó exitosamente, False si no existe en cache
         """
         try:
             cached_data = cache.get('recommendation_model_data')
-            if cached_data:
-                self.vectorizer = cached_data['vectorizer']
-                self.tfidf_matrix = cached_data['tfidf_matrix']
-                self.worker_ids = cached_data['worker_ids']
+            # Payloads anteriores (modelo completo dentro de Redis, sin
+            # worker_meta) se ignoran y el modelo se reentrena
+            if cached_data and 'path' in cached_data:
+                key = (cached_data['path'], cached_data['version'])
+                model_data = _LOADED_MODELS.get(key)
+                if model_data is None:
+                    import joblib
+                    model_data = joblib.load(cached_data['path'], mmap_mode='r')
+                    _LOADED_MODELS.clear()
+                    _LOADED_MODELS[key] = model_data
+                
+                self.vectorizer = model_data['vectorizer']
+                self.tfidf_matrix = model_data['tfidf_matrix']
+                self._set_worker_ids(model_data['worker_ids'])
+                self._feature_names = model_data['feature_names']
+                self.worker_meta = model_data['worker_meta']
+                self._model_version = cached_data['version']
                 logger.info("Modelo TF-IDF cargado desde cache exitosamente")
                 return True
+        except FileNotFoundError as e:
+            # Redis apunta a un archivo que este host no ve (ver RECOMMENDATION_MODEL_PATH)
+            logger.warning(
+                f"Modelo registrado en cache no existe en este host ({e}); "
+                "RECOMMENDATION_MODEL_PATH debe ser accesible por todos los procesos"
+            )
         except Exception as e:
             logger.warning(f"No se pudo cargar modelo desde cache: {e}")
         return False
     
+    def _set_worker_ids(self, worker_ids: List[str]) -> None:
+        """Asigna los IDs del corpus y reconstruye el índice ID → fila (O(1) por lookup)."""
+        self.worker_ids = worker_ids
+        self._worker_id_to_idx = {wid: i for i, wid in enumerate(worker_ids)}
+    
     def _save_to_cache(self) -> None:
-        """Guarda el modelo TF-IDF en Redis cache."""
+        """
+        Persiste el modelo TF-IDF en disco (joblib) y registra su ruta en Redis.
+        
+        El archivo se escribe en un temporal propio de esta escritura y se
+        reemplaza con os.replace (atómico), así ningún proceso lee un modelo a
+        medio escribir. Llamar con _model_write_lock tomado.
+        """
+        import joblib
+        
+        tmp_path = None
         try:
-            cache_data = {
+            model_path = settings.RECOMMENDATION_MODEL_PATH
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            
+            model_data = {
                 'vectorizer': self.vectorizer,
                 'tfidf_matrix': self.tfidf_matrix,
                 'worker_ids': self.worker_ids,
+                'feature_names': self._feature_names,
+                'worker_meta': self.worker_meta,
             }
-            cache.set('recommendation_model_data', cache_data, self.cache_ttl)
-            logger.info(f"Modelo TF-IDF guardado en cache (TTL: {self.cache_ttl}s)")
+            tmp_path = f"{model_path}.{uuid.uuid4().hex}.tmp"
+            joblib.dump(model_data, tmp_path)
+            os.replace(tmp_path, model_path)
+            tmp_path = None
+            
+            version = uuid.uuid4().hex
+            cache.set(
+                'recommendation_model_data',
+                {'path': model_path, 'version': version},
+                self.cache_ttl
+            )
+            self._model_version = version
+            logger.info(f"Modelo TF-IDF guardado en {model_path} (TTL: {self.cache_ttl}s)")
         except Exception as e:
             logger.error(f"Error al guardar modelo en cache: {e}")
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
     
     def expand_synonyms(self, text: str) -> str:
         """
@@ -252,24 +429,31 @@ class RecommendationEngine:
         if not text:
             return ""
         
-        # Convertir a minúsculas
-        text = text.lower()
-        
-        # Remover caracteres especiales, mantener letras (inglés + español), números y espacios
-        text = re.sub(r'[^a-záéíóúñü\s]', ' ', text)
-        
-        # Expandir sinónimos ANTES de remover stopwords (soporta ambos idiomas)
-        text = self.expand_synonyms(text)
-        
-        # Remover stopwords personalizadas (español e inglés)
-        words = text.split()
-        words = [w for w in words if w not in self.DOMAIN_STOPWORDS]
-        text = ' '.join(words)
+        return RecommendationEngine._preprocess_impl(text)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _preprocess_impl(text: str) -> str:
+        """
+        Implementación de preprocess_text, memoizada por texto.
         
-        # Remover espacios múltiples
-        text = re.sub(r'\s+', ' ', text).strip()
+        Es una función pura del texto y de constantes de clase, así que las
+        queries repetidas (ej: "plomero urgente") no se reprocesan.
+        """
+        # Minúsculas + remover caracteres especiales; split() colapsa espacios
+        words = RecommendationEngine._RE_NONLETTER.sub(' ', text.lower()).split()
+        
+        # Palabras originales sin stopwords, seguidas de la expansión de
+        # sinónimos (pre-tokenizada y sin stopwords) en una sola pasada
+        stopwords = RecommendationEngine.DOMAIN_STOPWORDS
+        processed = [word for word in words if word not in stopwords]
+        synonym_tokens = RecommendationEngine._SYNONYM_TOKENS
+        for word in words:
+            tokens = synonym_tokens.get(word)
+            if tokens:
+                processed.extend(tokens)
         
-        return text
+        return ' '.join(processed)
     
     def train_model(self, force_retrain: bool = False) -> Dict[str, any]:
         """
@@ -305,27 +489,41 @@ class RecommendationEngine:
         # Preparar corpus
         corpus = []
         worker_ids = []
+        meta_rows = []
         
         for worker in workers:
-            # Combinar bio + profession para contexto más rico
-            profession_text = worker.get_profession_display()
-            full_text = f"{worker.bio} {profession_text}"
-            processed_text = self.preprocess_text(full_text)
+            processed_text = self._worker_text(worker)
             
             if processed_text:  # Solo agregar si quedó texto después de preprocesamiento
                 corpus.append(processed_text)
                 worker_ids.append(str(worker.id))
+                meta_rows.append(self._worker_meta_row(worker))
         
         if len(corpus) == 0:
             raise ValueError("Corpus vacío después de preprocesamiento")
         
-        # Entrenar TF-IDF
-        self.vectorizer = TfidfVectorizer(**self.TFIDF_CONFIG)
-        self.tfidf_matrix = self.vectorizer.fit_transform(corpus)
-        self.worker_ids = worker_ids
+        # Entrenar TF-IDF (sklearn se importa solo al entrenar: es la dependencia
+        # más pesada y cargarla en el import retrasa el arranque de cada proceso)
+        from scipy import sparse
+        from sklearn.feature_extraction.text import TfidfVectorizer
         
-        # Guardar en cache
-        self._save_to_cache()
+        self.vectorizer = TfidfVectorizer(**self.TFIDF_CONFIG)
+        # csr_array (API de arrays de scipy): `@` devuelve ndarray, sin np.matrix
+        self.tfidf_matrix = sparse.csr_array(self.vectorizer.fit_transform(corpus))
+        self.tfidf_matrix.eliminate_zeros()
+        # stop_words_ (términos descartados por max_df/max_features) solo sirve
+        # para introspección; sklearn permite eliminarlo antes de serializar
+        self.vectorizer.stop_words_ = None
+        self._feature_names = self.vectorizer.get_feature_names_out()
+        self._set_worker_ids(worker_ids)
+        self.worker_meta = np.array(meta_rows, dtype=self.WORKER_META_DTYPE)
+        
+        # Guardar en cache (serializado con las actualizaciones parciales)
+        try:
+            with _model_write_lock():
+                self._save_to_cache()
+        except TimeoutError as e:
+            logger.warning(f"Modelo entrenado sin persistir: {e}")
         
         training_time = (time.time() - start_time) * 1000  # ms
         
@@ -340,6 +538,178 @@ class RecommendationEngine:
         logger.info(f"Modelo TF-IDF entrenado: {metrics}")
         return metrics
     
+    def _worker_text(self, worker: WorkerProfile) -> str:
+        """Texto preprocesado de un trabajador: bio + profesión para contexto más rico."""
+        return self.preprocess_text(f"{worker.bio} {worker.get_profession_display()}")
+    
+    @staticmethod
+    def _worker_meta_row(worker: WorkerProfile) -> Tuple:
+        """Fila de worker_meta (rating, profesión, lat, lng) de un trabajador."""
+        lng, lat = worker.location.coords if worker.location else (np.nan, np.nan)
+        return (float(worker.average_rating), worker.profession, lat, lng)
+    
+    def update_worker(self, worker: WorkerProfile) -> bool:
+        """
+        Actualiza en el modelo solo la fila de un trabajador (ver update_workers).
+        """
+        return self.update_workers([worker])
+    
+    def update_workers(self, workers: Iterable[WorkerProfile], wait: float = 30.0) -> bool:
+        """
+        Actualiza en el modelo solo las filas de estos trabajadores (sin reentrenar).
+        
+        Cada fila se recalcula con el vocabulario e IDF ya entrenados y se
+        reemplaza (o se agrega si el trabajador no estaba en el corpus). Un
+        trabajador inactivo o sin bio queda con fila vacía, así nunca supera
+        similitud 0. Si la mayoría de los términos de un nuevo texto no existen
+        en el vocabulario, el modelo ya no lo representa bien y se invalida
+        para reentrenar en la próxima query. El modelo se persiste una sola vez.
+        
+        Cargar → modificar → guardar corre bajo _model_write_lock. Si otro
+        proceso guardó una versión más nueva desde que esta instancia cargó el
+        modelo, se recarga antes de modificar, así no se pierden sus filas.
+        
+        Args:
+            workers: Perfiles ya guardados en la BD (con user, para is_active)
+            wait: Segundos máximos de espera por el lock del modelo
+            
+        Returns:
+            True si se actualizaron las filas, False si no había modelo o se invalidó
+            
+        Raises:
+            TimeoutError: Si otro proceso retiene el lock del modelo
+        """
+        with _model_write_lock(wait):
+            cached_data = cache.get('recommendation_model_data')
+            if not cached_data or 'path' not in cached_data:
+                # Sin modelo registrado: el próximo entrenamiento incluye los cambios
+                return False
+            if cached_data['version'] != self._model_version and not self._load_from_cache():
+                return False
+            return self._update_rows(workers)
+    
+    @staticmethod
+    def queue_worker_updates(worker_ids: Iterable[int]) -> None:
+        """
+        Encola perfiles editados para actualizar sus filas fuera del request.
+        
+        Solo escribe un set de IDs en el cache; el costo de cargar, recalcular
+        y persistir el modelo lo paga apply_pending_updates, que corre en la
+        siguiente query (get_recommendations) o en el comando
+        `apply_recommendation_updates`.
+        
+        Raises:
+            TimeoutError: Si no se obtiene el lock de la cola
+        """
+        with _pending_lock():
+            pending = cache.get(PENDING_UPDATES_KEY) or set()
+            pending.update(worker_ids)
+            cache.set(PENDING_UPDATES_KEY, pending, None)
+    
+    def apply_pending_updates(self, wait: float = 30.0) -> int:
+        """
+        Aplica al modelo los perfiles encolados por queue_worker_updates.
+        
+        Ante cualquier fallo los IDs vuelven a la cola antes de propagar la
+        excepción, así ningún perfil editado se pierde.
+        
+        Args:
+            wait: Segundos máximos de espera por el lock del modelo
+        
+        Returns:
+            Cantidad de perfiles procesados
+            
+        Raises:
+            TimeoutError: Si el modelo está bloqueado
+        """
+        with _pending_lock():
+            worker_ids = cache.get(PENDING_UPDATES_KEY) or set()
+            cache.delete(PENDING_UPDATES_KEY)
+        if not worker_ids:
+            return 0
+        
+        try:
+            self.update_workers(
+                WorkerProfile.objects.filter(pk__in=worker_ids).select_related('user'),
+                wait,
+            )
+        except Exception:
+            self.queue_worker_updates(worker_ids)
+            raise
+        cache.delete('recommendation_model_metadata')
+        return len(worker_ids)
+    
+    def _update_rows(self, workers: Iterable[WorkerProfile]) -> bool:
+        """Recalcula y persiste las filas de update_workers (con el lock tomado)."""
+        vocabulary = self.vectorizer.vocabulary_
+        replaced = {}  # fila → (texto, fila de worker_meta)
+        appended_ids, appended_texts, appended_meta = [], [], []
+        
+        for worker in workers:
+            eligible = worker.user.is_active and bool(worker.bio)
+            processed_text = self._worker_text(worker) if eligible else ''
+            
+            if processed_text:
+                tokens = processed_text.split()
+                unknown = sum(token not in vocabulary for token in tokens)
+                if unknown / len(tokens) > self.VOCABULARY_DRIFT_THRESHOLD:
+                    logger.info(
+                        f"Vocabulario desactualizado para worker {worker.id} "
+                        f"({unknown}/{len(tokens)} términos nuevos), invalidando modelo"
+                    )
+                    self.invalidate_cache()
+                    return False
+            
+            worker_id = str(worker.id)
+            idx = self._worker_id_to_idx.get(worker_id)
+            if idx is not None:
+                replaced[idx] = (processed_text, self._worker_meta_row(worker))
+            elif processed_text:
+                appended_ids.append(worker_id)
+                appended_texts.append(processed_text)
+                appended_meta.append(self._worker_meta_row(worker))
+            # Si no estaba en el corpus y sigue sin aportar texto, no hay nada que hacer
+        
+        if not replaced and not appended_ids:
+            return True
+        
+        from scipy import sparse
+        
+        # Los arrays cargados con mmap son de solo lectura: se construyen copias.
+        # La matriz se rearma en un solo vstack con los tramos sin cambios
+        matrix = self.tfidf_matrix
+        worker_meta = self.worker_meta.copy()
+        blocks = []
+        start = 0
+        if replaced:
+            rows = sorted(replaced)
+            new_rows = self.vectorizer.transform([replaced[i][0] for i in rows])
+            for position, idx in enumerate(rows):
+                blocks.append(matrix[start:idx])
+                blocks.append(new_rows[position:position + 1])
+                start = idx + 1
+            worker_meta[rows] = np.array(
+                [replaced[i][1] for i in rows], dtype=self.WORKER_META_DTYPE
+            )
+        blocks.append(matrix[start:])
+        if appended_ids:
+            blocks.append(self.vectorizer.transform(appended_texts))
+            worker_meta = np.concatenate([
+                worker_meta, np.array(appended_meta, dtype=self.WORKER_META_DTYPE)
+            ])
+        
+        self.tfidf_matrix = sparse.csr_array(sparse.vstack(blocks, format='csr'))
+        self.worker_meta = worker_meta
+        if appended_ids:
+            self._set_worker_ids(self.worker_ids + appended_ids)
+        
+        self._save_to_cache()
+        logger.info(
+            f"Filas TF-IDF actualizadas: {len(replaced)} reemplazadas, "
+            f"{len(appended_ids)} agregadas"
+        )
+        return True
+    
     def get_recommendations(
         self,
         query: str,
@@ -355,10 +725,11 @@ class RecommendationEngine:
             strategy: Estrategia de ranking ('tfidf', 'fallback', 'hybrid')
             top_n: Número de recomendaciones a retornar
             filters: Filtros adicionales:
-                - min_rating: Rating mínimo (Decimal)
+                - min_rating: Rating mínimo (float)
                 - max_distance_km: Distancia máxima en km (float)
                 - latitude: Latitud del usuario (float)
                 - longitude: Longitud del usuario (float)
+                - bbox: (xmin, ymin, xmax, ymax) del radio, prefiltro por índice (tuple)
                 - profession: Filtrar por profesión específica (str)
         
         Returns:
@@ -367,6 +738,10 @@ class RecommendationEngine:
         start_time = time.time()
         filters = filters or {}
         
+        # Aplicar los perfiles editados desde la última query (una lectura de
+        # cache si no hay ninguno)
+        self._drain_pending_updates()
+        
         # Validar que el modelo esté entrenado
         if self.vectorizer is None:
             logger.warning("Modelo no entrenado, entrenando ahora...")
@@ -395,6 +770,24 @@ class RecommendationEngine:
         
         return results
     
+    def _drain_pending_updates(self) -> None:
+        """
+        Aplica la cola de perfiles editados antes de rankear.
+        
+        No espera el lock del modelo: si otro proceso lo tiene, esta query usa
+        el modelo actual y los IDs quedan para la siguiente. Si la
+        actualización parcial falla, el modelo se invalida y se reentrena.
+        """
+        if not cache.get(PENDING_UPDATES_KEY):
+            return
+        try:
+            self.apply_pending_updates(wait=0)
+        except TimeoutError:
+            logger.info("Modelo bloqueado, perfiles pendientes quedan en la cola")
+        except Exception as e:
+            logger.warning(f"Actualización parcial del modelo falló, invalidando: {e}")
+            self.invalidate_cache()
+    
     def _strategy_tfidf(
         self,
         processed_query: str,
@@ -407,37 +800,116 @@ class RecommendationEngine:
         # Vectorizar query
         query_vector = self.vectorizer.transform([processed_query])
         
-        # Calcular similitud coseno
-        similarities = cosine_similarity(query_vector, self.tfidf_matrix)[0]
+        # Similitud coseno: las filas de TF-IDF ya están normalizadas (norm='l2'),
+        # así que basta un producto matriz dispersa × vector. Con el vector denso
+        # scipy usa csr_matvec y escribe directo en un array 1-D (sin CSR intermedio)
+        similarities = self.tfidf_matrix @ query_vector.toarray().ravel()
+        
+        return self._rank_tfidf(query_vector, similarities, top_n, filters)
+    
+    def _rank_tfidf(
+        self,
+        query_vector,
+        similarities: np.ndarray,
+        top_n: int,
+        filters: Dict
+    ) -> List[Dict]:
+        """
+        Selecciona, filtra y explica los mejores trabajadores dado el vector
+        de similitudes (una entrada por fila de la matriz TF-IDF) y el vector
+        TF-IDF de la query (fila CSR, reutilizada por _explain_tfidf).
+        """
+        # Solo filas con similitud > 0 (suelen ser pocas); sin ninguna, no hay
+        # nada que filtrar ni hidratar
+        nonzero = np.flatnonzero(similarities > 0)
+        if nonzero.size == 0:
+            return []
         
-        # Obtener top N índices
-        top_indices = similarities.argsort()[-top_n*3:][::-1]  # 3x para filtrado posterior
+        # Filtros como máscara sobre worker_meta (sin consultar la BD): prefiltro
+        # barato que descarta la mayoría de filas antes de hidratar
+        eligible = nonzero[self._filter_mask(filters, nonzero)]
+        if eligible.size == 0:
+            return []
         
-        # Obtener trabajadores
-        candidate_ids = [self.worker_ids[i] for i in top_indices if similarities[i] > 0]
-        workers = WorkerProfile.objects.filter(
-            id__in=candidate_ids
+        # La máscara usa el snapshot del entrenamiento: al hidratar se reaplican
+        # los filtros sobre la fila actual (_apply_filters) y se filtra por
+        # user.is_active (JOIN ya presente por select_related; la copia
+        # desnormalizada puede quedar desfasada tras updates masivos de User)
+        hydration_qs = self._apply_filters(
+            WorkerProfile.objects.filter(user__is_active=True), filters
         ).select_related('user')
         
-        # Aplicar filtros
-        workers = self._apply_filters(workers, filters)
-        
-        # Construir resultados con explicabilidad
+        # Top N + margen para trabajadores que ya no pasan los filtros: argpartition
+        # es O(W) y solo se ordenan los k candidatos. Si tras hidratar faltan
+        # resultados, se duplica k y se hidratan solo los candidatos nuevos
         results = []
-        for worker in workers[:top_n]:
-            idx = self.worker_ids.index(str(worker.id))
-            similarity = float(similarities[idx])
+        seen = np.zeros(0, dtype=eligible.dtype)
+        k = min(top_n * 3, eligible.size)
+        while True:
+            candidates = eligible[np.argpartition(similarities[eligible], -k)[-k:]]
+            candidates = candidates[~np.isin(candidates, seen)]
+            top_indices = candidates[np.argsort(-similarities[candidates], kind='stable')]
+            seen = np.concatenate([seen, top_indices])
             
-            result = {
-                'worker': worker,
-                'score': similarity,
-                'relevance_percentage': round(similarity * 100, 1),
-                'strategy': 'tfidf',
-                'explanation': self._explain_tfidf(processed_query, worker, similarity)
+            # Hidratar solo este lote, conservando el orden del ranking
+            workers_by_id = {
+                str(pk): worker
+                for pk, worker in hydration_qs.in_bulk(
+                    [self.worker_ids[i] for i in top_indices]
+                ).items()
             }
-            results.append(result)
+            
+            # Construir resultados con explicabilidad
+            for idx in top_indices:
+                worker = workers_by_id.get(self.worker_ids[idx])
+                if worker is None:
+                    continue
+                similarity = float(similarities[idx])
+                
+                result = {
+                    'worker': worker,
+                    'score': similarity,
+                    'relevance_percentage': round(similarity * 100, 1),
+                    'strategy': 'tfidf',
+                    'explanation': self._explain_tfidf(query_vector, worker, similarity)
+                }
+                results.append(result)
+                if len(results) == top_n:
+                    return results
+            
+            if k == eligible.size:
+                return results
+            k = min(k * 2, eligible.size)
+    
+    def _filter_mask(self, filters: Dict, rows: np.ndarray) -> np.ndarray:
+        """
+        Equivalente vectorizado de _apply_filters sobre worker_meta. Evalúa el
+        snapshot del último entrenamiento/actualización: _rank_tfidf reaplica
+        _apply_filters al hidratar los candidatos.
         
-        return results
+        Args:
+            filters: Mismos filtros que _apply_filters
+            rows: Índices de filas de la matriz TF-IDF a evaluar
+        
+        Returns:
+            Máscara booleana alineada con `rows`
+        """
+        meta = self.worker_meta[rows]
+        mask = np.ones(len(meta), dtype=bool)
+        
+        if 'min_rating' in filters:
+            mask &= meta['rating'] >= filters['min_rating']
+        
+        # Filas sin ubicación (NaN) quedan fuera: NaN <= x es False
+        if all(k in filters for k in ['latitude', 'longitude', 'max_distance_km']):
+            mask &= _haversine_km(
+                meta['lat'], meta['lng'], filters['latitude'], filters['longitude']
+            ) <= filters['max_distance_km']
+        
+        if 'profession' in filters:
+            mask &= meta['profession'] == filters['profession']
+        
+        return mask
     
     def _strategy_fallback(
         self,
@@ -494,110 +966,125 @@ class RecommendationEngine:
         # Obtener candidatos por TF-IDF
         tfidf_results = self._strategy_tfidf(processed_query, top_n * 2, filters)
         
-        # Calcular score híbrido para cada candidato
-        hybrid_results = []
+        if not tfidf_results:
+            return []
+        
+        workers = [result['worker'] for result in tfidf_results]
+        n = len(workers)
+        weights = self.HYBRID_WEIGHTS
+        
+        # Componente 1: TF-IDF (ya normalizado 0-1)
+        tfidf_components = np.fromiter(
+            (result['score'] for result in tfidf_results), dtype=float, count=n
+        ) * weights['tfidf_score']
+        
+        # Componente 2: Rating normalizado, leído de la fila hidratada (worker_meta
+        # puede conservar el rating anterior a un QuerySet.update)
+        rating_components = np.fromiter(
+            (float(worker.average_rating) for worker in workers), dtype=float, count=n
+        ) / 5.0 * weights['rating_boost']
+        
+        # Componente 3: Proximidad (si hay geolocalización), calculada en bloque
+        proximity_components = np.zeros(n)
+        distances_km = np.full(n, np.nan)
         
         user_location = filters.get('latitude') and filters.get('longitude')
+        located = [i for i, worker in enumerate(workers) if worker.location] if user_location else []
         
-        for result in tfidf_results:
-            worker = result['worker']
-            tfidf_score = result['score']
-            
-            # Componente 1: TF-IDF (ya normalizado 0-1)
-            tfidf_component = tfidf_score * self.HYBRID_WEIGHTS['tfidf_score']
-            
-            # Componente 2: Rating normalizado
-            rating_normalized = float(worker.average_rating) / 5.0
-            rating_component = rating_normalized * self.HYBRID_WEIGHTS['rating_boost']
-            
-            # Componente 3: Proximidad (si hay geolocalización)
-            proximity_component = 0
-            distance_km = None
-            
-            if user_location and worker.location:
-                user_point = Point(filters['longitude'], filters['latitude'], srid=4326)
-                distance_km = worker.location.distance(user_point) * 111  # Convertir a km aprox
-                
-                # Normalizar distancia (inversa): cercano = 1, lejano = 0
-                max_distance = filters.get('max_distance_km', 50)
-                proximity_normalized = max(0, 1 - (distance_km / max_distance))
-                proximity_component = proximity_normalized * self.HYBRID_WEIGHTS['proximity_boost']
+        if located:
+            coords = np.array([workers[i].location.coords for i in located])
+            located_km = _haversine_km(
+                coords[:, 1], coords[:, 0], filters['latitude'], filters['longitude']
+            )
+            distances_km[located] = located_km
             
-            # Score híbrido final
-            hybrid_score = tfidf_component + rating_component + proximity_component
+            # Normalizar distancia (inversa): cercano = 1, lejano = 0
+            max_distance = filters.get('max_distance_km', DEFAULT_MAX_DISTANCE_KM)
+            proximity_components[located] = (
+                np.maximum(0, 1 - located_km / max_distance) * weights['proximity_boost']
+            )
+        
+        # Score híbrido final; orden estable descendente (empates conservan orden TF-IDF)
+        hybrid_scores = tfidf_components + rating_components + proximity_components
+        order = np.argsort(-hybrid_scores, kind='stable')[:top_n]
+        
+        hybrid_results = []
+        for i in order:
+            hybrid_score = float(hybrid_scores[i])
+            distance_km = float(distances_km[i])
             
-            hybrid_result = {
-                'worker': worker,
+            hybrid_results.append({
+                'worker': workers[i],
                 'score': hybrid_score,
                 'relevance_percentage': round(hybrid_score * 100, 1),
                 'strategy': 'hybrid',
                 'explanation': {
-                    **result['explanation'],
+                    **tfidf_results[i]['explanation'],
                     'score_breakdown': {
-                        'tfidf_score': round(tfidf_component, 3),
-                        'rating_boost': round(rating_component, 3),
-                        'proximity_boost': round(proximity_component, 3),
+                        'tfidf_score': round(float(tfidf_components[i]), 3),
+                        'rating_boost': round(float(rating_components[i]), 3),
+                        'proximity_boost': round(float(proximity_components[i]), 3),
                         'total': round(hybrid_score, 3),
                     },
-                    'distance_km': round(distance_km, 2) if distance_km else None,
+                    # NaN (sin ubicación) y 0.0 se reportan como None, como antes
+                    'distance_km': round(distance_km, 2) if distance_km > 0 else None,
                 }
-            }
-            hybrid_results.append(hybrid_result)
-        
-        # Reordenar por score híbrido
-        hybrid_results.sort(key=lambda x: x['score'], reverse=True)
+            })
         
-        return hybrid_results[:top_n]
+        return hybrid_results
     
     def _explain_tfidf(
         self,
-        processed_query: str,
+        query_vector,
         worker: WorkerProfile,
         similarity_score: float
     ) -> Dict:
         """
         Genera explicación de por qué se recomendó un trabajador (XAI).
         
+        Args:
+            query_vector: Fila CSR con el TF-IDF de la query (ya vectorizada al rankear)
+            worker: Trabajador recomendado
+            similarity_score: Similitud coseno query-trabajador
+        
         Returns:
             Diccionario con keywords matched y términos relevantes
         """
-        # Obtener términos del vectorizador
-        feature_names = self.vectorizer.get_feature_names_out()
-        
-        # Vectorizar query y bio del trabajador
-        query_vector = self.vectorizer.transform([processed_query])
-        
-        worker_idx = self.worker_ids.index(str(worker.id))
-        worker_vector = self.tfidf_matrix[worker_idx]
-        
-        # Encontrar términos con mayor peso en ambos
-        query_terms = query_vector.toarray()[0]
-        worker_terms = worker_vector.toarray()[0]
-        
-        # Keywords matched (términos presentes en ambos)
-        matched_keywords = []
-        for i, term in enumerate(feature_names):
-            if query_terms[i] > 0 and worker_terms[i] > 0:
-                matched_keywords.append({
-                    'term': term,
-                    'query_weight': round(float(query_terms[i]), 3),
-                    'worker_weight': round(float(worker_terms[i]), 3),
-                })
-        
-        # Ordenar por peso en query
-        matched_keywords.sort(key=lambda x: x['query_weight'], reverse=True)
+        # Términos del vectorizador (cacheados junto al modelo)
+        feature_names = self._feature_names
+        
+        # Fila del trabajador leída directo de indptr: vistas de indices/data,
+        # sin construir una matriz dispersa por resultado
+        worker_idx = self._worker_id_to_idx[str(worker.id)]
+        start, end = self.tfidf_matrix.indptr[worker_idx:worker_idx + 2]
+        worker_indices = self.tfidf_matrix.indices[start:end]
+        worker_weights = self.tfidf_matrix.data[start:end]
+        
+        # Keywords matched: intersección de los índices no nulos de ambas filas
+        common, query_pos, worker_pos = np.intersect1d(
+            query_vector.indices, worker_indices,
+            assume_unique=True, return_indices=True,
+        )
+        positive = (query_vector.data[query_pos] > 0) & (worker_weights[worker_pos] > 0)
+        common = common[positive]
+        query_weights = query_vector.data[query_pos[positive]]
+        
+        # Ordenar por peso en query (redondeado, empates por orden de vocabulario)
+        matched_order = np.argsort(-np.round(query_weights, 3), kind='stable')[:5]
+        matched_keywords = [str(feature_names[common[i]]) for i in matched_order]
         
         # Top términos del trabajador (incluso si no matchearon)
-        top_worker_terms = []
-        worker_term_indices = worker_terms.argsort()[-10:][::-1]
-        for i in worker_term_indices:
-            if worker_terms[i] > 0:
-                top_worker_terms.append(feature_names[i])
+        top_order = np.argsort(-worker_weights, kind='stable')[:5]
+        top_worker_terms = [
+            str(feature_names[worker_indices[i]])
+            for i in top_order
+            if worker_weights[i] > 0
+        ]
         
         return {
             'method': 'TF-IDF Cosine Similarity',
-            'matched_keywords': [m['term'] for m in matched_keywords[:5]],
-            'top_bio_terms': top_worker_terms[:5],
+            'matched_keywords': matched_keywords,
+            'top_bio_terms': top_worker_terms,
             'similarity_score': round(similarity_score, 3),
         }
     
@@ -613,8 +1100,13 @@ class RecommendationEngine:
         if 'min_rating' in filters:
             queryset = queryset.filter(average_rating__gte=filters['min_rating'])
         
-        # Filtro por distancia geográfica
+        # Filtro por distancia geográfica. El bounding box (operador @, usa el
+        # índice GiST de location) descarta candidatos antes del cálculo exacto
         if all(k in filters for k in ['latitude', 'longitude', 'max_distance_km']):
+            if 'bbox' in filters:
+                queryset = queryset.filter(
+                    location__contained=Polygon.from_bbox(filters['bbox'])
+                )
             user_point = Point(filters['longitude'], filters['latitude'], srid=4326)
             queryset = queryset.filter(
                 location__distance_lte=(user_point, D(km=filters['max_distance_km']))
@@ -633,18 +1125,10 @@ class RecommendationEngine:
         Returns:
             Código de la profesión (ej: 'PLUMBER') o None
         """
-        profession_keywords = {
-            'PLUMBER': ['plomero', 'fontanero', 'gasfiter', 'tubería', 'fuga'],
-            'ELECTRICIAN': ['electricista', 'luz', 'electricidad', 'cableado'],
-            'MASON': ['albañil', 'construcción', 'mampostería', 'obra'],
-            'PAINTER': ['pintor', 'pintura', 'barniz'],
-            'CARPENTER': ['carpintero', 'carpintería', 'madera', 'mueble'],
-        }
-        
         text_lower = text.lower()
         
-        for profession, keywords in profession_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
+        for profession, pattern in self._PROFESSION_PATTERNS:
+            if pattern.search(text_lower):
                 return profession
         
         return None
@@ -656,5 +1140,10 @@ class RecommendationEngine:
         cache.delete('recommendation_model_data')
         self.vectorizer = None
         self.tfidf_matrix = None
-        self.worker_ids = []
+        self._feature_names = None
+        self.worker_meta = None
+        self._set_worker_ids([])
+        self._model_version = None
+        RecommendationEngine._preprocess_impl.cache_clear()
+        _LOADED_MODELS.clear()
         logger.info("Cache del modelo TF-IDF invalidado")
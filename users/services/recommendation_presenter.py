@@ -1,5 +1,59 @@
-from typing import List, Dict, Any
-from decimal import Decimal
+from operator import itemgetter
+from typing import List, Dict, Any, Optional
+
+# Separators and fallback text for RecommendationPresenter._build_explanation
+_PART_SEPARATOR = " - "
+_KEYWORD_SEPARATOR = ", "
+_NO_MATCH_EXPLANATION = "Recomendado por filtros"
+# printf-style templates for the numeric parts (single-value %-formatting
+# benchmarks slightly ahead of f-strings and bound str.format)
+_RELEVANCE_TEMPLATE = "%.0f%% relevante"
+_DISTANCE_TEMPLATE = "a %.1fkm"
+
+
+class RecommendationMeta:
+    """
+    Recommendation metadata attached to a worker as `worker._recommendation`.
+    
+    One slotted object per result instead of several ad-hoc attributes on the
+    model instance; WorkerRecommendationSerializer reads it via dotted sources.
+    """
+    
+    __slots__ = (
+        'lat',
+        'lng',
+        'score',
+        'relevance_percentage',
+        'matched_keywords',
+        'distance_km',
+        'distance_factor',
+        'normalized_score',
+        'explanation',
+    )
+    
+    def __init__(self, lat, lng, score, relevance_percentage, matched_keywords,
+                 distance_km, distance_factor, normalized_score, explanation):
+        self.lat = lat
+        self.lng = lng
+        self.score = score
+        self.relevance_percentage = relevance_percentage
+        self.matched_keywords = matched_keywords
+        self.distance_km = distance_km
+        self.distance_factor = distance_factor
+        self.normalized_score = normalized_score
+        self.explanation = explanation
+    
+    @property
+    def details(self) -> Dict[str, Any]:
+        """Detailed scoring in its response shape (`recommendation_details`)."""
+        return {
+            'semantic_similarity': self.score,
+            'relevance_percentage': self.relevance_percentage,
+            'distance_km': self.distance_km,
+            'distance_factor': self.distance_factor,
+            'normalized_score': self.normalized_score,
+            'matched_terms_count': len(self.matched_keywords),
+        }
 
 
 class RecommendationPresenter:
@@ -13,72 +67,94 @@ class RecommendationPresenter:
     """
     
     @staticmethod
-    def prepare_worker_data(results: List[Dict[str, Any]]) -> tuple[List, List[str]]:
+    def prepare_worker_data(
+        results: List[Dict[str, Any]],
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> tuple[List, List[int]]:
         """
         Enrich worker objects with recommendation metadata.
         
+        Each worker gets a single `_recommendation` attribute (RecommendationMeta).
+        Filtering and truncation happen before enrichment, so dropped results
+        never pay for explanation building.
+        
         Args:
             results: List of dicts with 'worker', 'score', 'explanation' keys
+            top_k: Keep only the top_k highest-scoring results (None keeps all)
+            min_score: Drop results with score <= min_score (None keeps all;
+                fallback results can legitimately score 0)
             
         Returns:
             Tuple of (enriched_workers, worker_ids)
         """
-        recommendations_data = []
-        worker_ids = []
+        if min_score is not None:
+            results = [result for result in results if result['score'] > min_score]
+        if top_k is not None:
+            # Stable sort: engine results already come ranked, ties keep their order
+            results = sorted(results, key=itemgetter('score'), reverse=True)[:top_k]
         
-        for result in results:
-            worker = result['worker']
-            worker_ids.append(str(worker.id))
-            
-            # Store complete recommendation data as private attribute
-            worker._recommendation_data = {
-                'score': result['score'],
-                'relevance_percentage': result['relevance_percentage'],
-                'matched_keywords': result['explanation'].get('matched_keywords', []),
-                'distance_km': result['explanation'].get('distance_km'),
-                'distance_factor': result['explanation'].get('distance_factor'),
-                'normalized_score': result.get('normalized_score', result['score']),
-            }
-            
-            # Add flat fields for frontend compatibility
-            worker.recommendation_score = result['score']
-            worker.matched_keywords = result['explanation'].get('matched_keywords', [])
+        recommendations_data = [result['worker'] for result in results]
+        worker_ids = [worker.id for worker in recommendations_data]
+        
+        for worker, result in zip(recommendations_data, results):
+            # Read the geometry once; the serializer uses the plain coordinates
+            location = worker.location
+            lat, lng = (location.y, location.x) if location else (None, None)
             
-            # Generate human-readable explanation
-            worker.explanation = RecommendationPresenter._build_explanation(result)
+            explanation = result['explanation']
+            matched_keywords = explanation.get('matched_keywords', [])
+            distance_km = explanation.get('distance_km')
+            relevance_pct = result['relevance_percentage']
+            score = result['score']
             
-            recommendations_data.append(worker)
+            worker._recommendation = RecommendationMeta(
+                lat,
+                lng,
+                score,
+                relevance_pct,
+                matched_keywords,
+                distance_km,
+                explanation.get('distance_factor'),
+                result.get('normalized_score', score),
+                # Human-readable explanation
+                RecommendationPresenter._build_explanation(
+                    relevance_pct, matched_keywords, distance_km
+                ),
+            )
         
         return recommendations_data, worker_ids
     
     @staticmethod
-    def _build_explanation(result: Dict[str, Any]) -> str:
+    def _build_explanation(
+        relevance_pct: float,
+        keywords: List[str],
+        distance: Optional[float]
+    ) -> str:
         """
-        Build human-readable explanation from ML result.
+        Build human-readable explanation from ML result values.
         
         Args:
-            result: Dict with 'relevance_percentage', 'explanation' keys
+            relevance_pct: Relevance percentage (0-100)
+            keywords: Matched keywords, most relevant first
+            distance: Distance in km, or None without geolocation
             
         Returns:
             String like "87% relevante - coincide con: fuga, agua - a 2.5km"
         """
-        relevance_pct = result['relevance_percentage']
-        keywords = result['explanation'].get('matched_keywords', [])
-        distance = result['explanation'].get('distance_km')
-        
-        explanation_parts = []
-        
-        if relevance_pct > 0:
-            explanation_parts.append(f"{relevance_pct:.0f}% relevante")
-        
-        if keywords:
-            keywords_str = ', '.join(keywords[:3])  # Max 3 keywords
-            explanation_parts.append(f"coincide con: {keywords_str}")
-        
-        if distance is not None:
-            explanation_parts.append(f"a {distance:.1f}km")
+        explanation_parts = [
+            part for part in (
+                _RELEVANCE_TEMPLATE % relevance_pct if relevance_pct > 0 else None,
+                # Max 3 keywords
+                f"coincide con: {_KEYWORD_SEPARATOR.join(keywords[:3])}" if keywords else None,
+                _DISTANCE_TEMPLATE % distance if distance is not None else None,
+            ) if part
+        ]
         
-        return " - ".join(explanation_parts) if explanation_parts else "Recomendado por filtros"
+        return (
+            _PART_SEPARATOR.join(explanation_parts)
+            if explanation_parts else _NO_MATCH_EXPLANATION
+        )
     
     @staticmethod
     def build_response(
@@ -1,16 +1,25 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from .models import WorkerProfile
 from .services.dashboard_service import DashboardService
 from django.core.cache import cache
+from django.db import connection, transaction
 import logging
+import threading
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
+# Claves de cache del modelo de recomendación (modelo + metadata de entrenamiento)
+_REC_CACHE_KEYS = ('recommendation_model_data', 'recommendation_model_metadata')
 
-@receiver(post_save, sender=User)
+# IDs de WorkerProfile guardados en la transacción en curso (por hilo), pendientes
+# de encolarse para el modelo de recomendación en on_commit
+_pending_recommendation_updates = threading.local()
+
+
+@receiver(post_save, sender=User, dispatch_uid='users.create_worker_profile')
 def create_worker_profile(sender, instance, created, **kwargs):
     """
     Crea automáticamente un WorkerProfile cuando se registra un usuario con rol WORKER.
@@ -20,7 +29,56 @@ def create_worker_profile(sender, instance, created, **kwargs):
         logger.info(f"WorkerProfile creado automáticamente para usuario {instance.email}")
 
 
-@receiver(post_save, sender=User)
+@receiver(pre_save, sender=WorkerProfile, dispatch_uid='users.set_worker_profile_is_active')
+def set_worker_profile_is_active(sender, instance, **kwargs):
+    """
+    Inicializa la copia desnormalizada de is_active al crear un WorkerProfile.
+    """
+    if instance._state.adding:
+        instance.is_active = instance.user.is_active
+
+
+@receiver(pre_save, sender=WorkerProfile, dispatch_uid='users.set_worker_profile_is_geolocated')
+def set_worker_profile_is_geolocated(sender, instance, update_fields=None, **kwargs):
+    """
+    Mantiene la bandera is_geolocated a partir de location.
+    
+    Un save parcial que no escribe location no la recalcula (ni la carga si
+    estaba diferida); WorkerProfile.save agrega is_geolocated a update_fields
+    cuando estos incluyen location.
+    """
+    if update_fields is not None and 'location' not in update_fields:
+        return
+    instance.is_geolocated = instance.location is not None
+
+
+@receiver(pre_save, sender=WorkerProfile, dispatch_uid='users.flag_recommendation_fields_changed')
+def flag_recommendation_fields_changed(sender, instance, update_fields=None, **kwargs):
+    """
+    Marca si el save cambia campos del modelo de recomendación (ver post_save).
+    
+    Se calcula en el save y no al cargar instancias: las lecturas (listados,
+    hidratación de recomendaciones) no pagan ningún costo.
+    """
+    instance._recommendation_fields_changed = instance.recommendation_fields_changed(update_fields)
+
+
+@receiver(post_save, sender=User, dispatch_uid='users.sync_worker_profile_is_active')
+def sync_worker_profile_is_active(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Mantiene WorkerProfile.is_active sincronizado con User.is_active.
+    
+    La columna desnormalizada permite que los índices parciales de WorkerProfile
+    se usen sin necesidad de hacer JOIN con la tabla de usuarios.
+    """
+    if created or (update_fields is not None and 'is_active' not in update_fields):
+        return
+    WorkerProfile.objects.filter(user=instance).exclude(
+        is_active=instance.is_active
+    ).update(is_active=instance.is_active)
+
+
+@receiver(post_save, sender=User, dispatch_uid='users.invalidate_dashboard_cache_on_user_change')
 def invalidate_dashboard_cache_on_user_change(sender, instance, created, **kwargs):
     """
     Invalida el caché del dashboard administrativo cuando se crea o actualiza un usuario.
@@ -33,36 +91,78 @@ def invalidate_dashboard_cache_on_user_change(sender, instance, created, **kwarg
         logger.info(f"Dashboard cache invalidated: new user {instance.email} created")
 
 
-@receiver(post_save, sender=WorkerProfile)
+def _queue_pending_recommendation_updates():
+    """
+    Encola los perfiles guardados en la transacción para el modelo de recomendación.
+    
+    Se ejecuta una sola vez por transacción (on_commit), aunque se hayan guardado
+    muchos perfiles. Solo escribe los IDs en el cache: las filas se recalculan
+    fuera del request que guardó, en la siguiente query de recomendación
+    (o antes, con `manage.py apply_recommendation_updates`).
+    """
+    from .services.recommendation_engine import RecommendationEngine
+    
+    worker_ids = getattr(_pending_recommendation_updates, 'worker_ids', None)
+    _pending_recommendation_updates.worker_ids = set()
+    if not worker_ids:
+        return
+    
+    try:
+        RecommendationEngine.queue_worker_updates(worker_ids)
+        logger.info(f"{len(worker_ids)} perfil(es) encolados para el modelo de recomendación")
+        return
+    except Exception as e:
+        logger.warning(f"No se pudieron encolar perfiles, invalidando modelo: {e}")
+    
+    try:
+        # Una sola operación contra el backend de cache
+        cache.delete_many(_REC_CACHE_KEYS)
+    except Exception as e:
+        # Redis might not be running, log but don't fail
+        logger.warning(
+            f"No se pudo invalidar cache (Redis no disponible): {e}"
+        )
+
+
+@receiver(post_save, sender=WorkerProfile, dispatch_uid='users.invalidate_recommendation_cache')
 def invalidate_recommendation_cache(sender, instance, **kwargs):
     """
-    Invalida el cache del modelo de recomendación cuando se actualiza un WorkerProfile.
+    Programa la actualización del modelo de recomendación al editar un WorkerProfile.
     
-    Esto fuerza el reentrenamiento del modelo TF-IDF en la próxima query,
-    asegurando que los cambios en biografías y skills se reflejen en las recomendaciones.
+    Solo se recalcula la fila TF-IDF del trabajador (RecommendationEngine.update_workers),
+    asegurando que los cambios en biografías y skills se reflejen en las recomendaciones
+    sin reentrenar todo el corpus. El request solo encola el ID; la próxima
+    query de recomendación aplica la cola. Si no se puede encolar, el cache
+    se invalida y el modelo se reentrena en la próxima query.
     
-    El cache se invalida siempre que se actualiza un perfil de trabajador
-    (enfoque conservador para garantizar datos frescos).
+    El encolado se difiere al commit y se agrupa: varios saves en una misma
+    transacción (ej: ediciones masivas desde el admin) encolan una sola vez.
     """
-    # Solo invalidar en updates, no en creación
+    # Solo actualizar en updates, no en creación, y si cambió algún campo que
+    # usa el modelo (bio, profesión, rating, ubicación, is_active)
     if not kwargs.get('created', False):
-        try:
-            cache.delete('recommendation_model_data')
-            cache.delete('recommendation_model_metadata')
-            logger.info(
-                f"Cache de recomendación invalidado por actualización de {instance.user.email}"
-            )
-        except Exception as e:
-            # Redis might not be running, log but don't fail
-            logger.warning(
-                f"No se pudo invalidar cache (Redis no disponible): {e}"
-            )
+        if not getattr(instance, '_recommendation_fields_changed', True):
+            return
+        
+        if not hasattr(_pending_recommendation_updates, 'worker_ids'):
+            _pending_recommendation_updates.worker_ids = set()
+        _pending_recommendation_updates.worker_ids.add(instance.pk)
+        
+        # Registrar el callback solo una vez por transacción. Si la transacción
+        # hace rollback, Django descarta el callback y el siguiente save lo registra
+        # de nuevo (los IDs pendientes se reprocesan contra la BD, sin efecto)
+        already_scheduled = any(
+            entry[1] is _queue_pending_recommendation_updates
+            for entry in connection.run_on_commit
+        )
+        if not already_scheduled:
+            transaction.on_commit(_queue_pending_recommendation_updates)
         
-        # Nota: El modelo se reentrenará automáticamente en la próxima query
-        # o puede reentrenarse manualmente con: python manage.py train_recommendation_model
+        # Nota: El modelo completo puede reentrenarse manualmente con:
+        # python manage.py train_recommendation_model
 
 
-@receiver(post_save, sender=WorkerProfile)
+@receiver(post_save, sender=WorkerProfile, dispatch_uid='users.invalidate_dashboard_cache_on_worker_change')
 def invalidate_dashboard_cache_on_worker_change(sender, instance, **kwargs):
     """
     Invalida el caché del dashboard cuando se crea o actualiza un WorkerProfile.
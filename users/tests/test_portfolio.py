@@ -5,14 +5,18 @@ Cubre:
 - Validadores de imagen (tamaño, formato, MIME type)
 - Permisos (IsWorkerAndOwnerOrReadOnly)
 - Endpoints CRUD de portfolio
-- Compresión de imágenes
+- Compresión de imágenes (inmediata y diferida)
 - Manejo de archivos corruptos
 
 """
+import functools
+import hashlib
+import struct
 import tempfile
-from io import BytesIO
+from io import BytesIO, StringIO
 from PIL import Image as PILImage
 from django.test import TestCase, override_settings
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.exceptions import ValidationError
 from rest_framework.test import APITestCase, APIClient
@@ -23,11 +27,69 @@ from orders.models import ServiceOrder
 from users.validators import validate_image_size, ImageContentTypeValidator
 from users.permissions import IsWorkerAndOwnerOrReadOnly
 from users.constants import MAX_IMAGE_SIZE_MB, ALLOWED_IMAGE_EXTENSIONS
-from unittest.mock import Mock
 from decimal import Decimal
 
 User = get_user_model()
 
+# Hasher rápido para fixtures: ningún test de este módulo hace login con
+# contraseña (todos usan force_authenticate), así que PBKDF2 es costo puro
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@functools.lru_cache(maxsize=32)
+def _encode_image(format, width, height, color, quality=None):
+    """
+    Codifica una imagen sólida con PIL, una sola vez por combinación de parámetros.
+    
+    Devuelve bytes (inmutables): cada test crea su propio SimpleUploadedFile.
+    """
+    img = PILImage.new('RGB', (width, height), color=color)
+    buffer = BytesIO()
+    save_kwargs = {} if quality is None else {'quality': quality}
+    img.save(buffer, format=format, **save_kwargs)
+    return buffer.getvalue()
+
+
+# JPEG mínimo para tests a los que no les importan las dimensiones
+# (permisos, serializers, relación con órdenes)
+TINY_JPEG = _encode_image('JPEG', 8, 8, 'blue', 10)
+
+
+# Marcadores SOF0-SOF2 (baseline, extended, progressive) de JPEG
+_JPEG_SOF_MARKERS = (0xC0, 0xC1, 0xC2)
+
+
+def _jpeg_size(data):
+    """
+    Lee (width, height) del segmento SOF de un JPEG sin decodificarlo.
+    
+    Recorre los segmentos desde SOI; devuelve None si no encuentra el SOF
+    en `data` (ej: no es JPEG o el header es más largo que lo leído).
+    """
+    i = 2  # Tras el marcador SOI (FF D8)
+    while i + 9 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        segment_length, = struct.unpack('>H', data[i + 2:i + 4])
+        i += 2 + segment_length
+    return None
+
+
+def _raw_blob(size_mb):
+    """
+    Archivo de `size_mb` MB de ceros, sin codificar ninguna imagen.
+    
+    Para tests de tamaño: validate_image_size solo mira `size`, el contenido
+    no necesita ser un JPEG válido.
+    """
+    return SimpleUploadedFile(
+        "x.jpg",
+        bytes(int(size_mb * 1024 * 1024)),
+        content_type="image/jpeg"
+    )
+
 
 # ============================================================================
 # TESTS UNITARIOS DE VALIDADORES
@@ -36,48 +98,34 @@ User = get_user_model()
 class ImageValidatorTests(TestCase):
     """Tests para validadores de imagen"""
 
-    def create_test_image(self, size_mb=1, format='JPEG', width=800, height=600):
+    def create_test_image(self, format='JPEG', width=800, height=600):
         """
-        Helper para crear imágenes de prueba con tamaño específico.
+        Helper para crear imágenes de prueba válidas (tests de tipo/contenido).
         
         Args:
-            size_mb: Tamaño aproximado en MB
             format: Formato de imagen (JPEG, PNG, WEBP)
             width, height: Dimensiones
         
         Returns:
             SimpleUploadedFile con imagen generada
         """
-        img = PILImage.new('RGB', (width, height), color='red')
-        buffer = BytesIO()
-        
-        # Ajustar calidad para alcanzar tamaño aproximado
         if format == 'JPEG':
-            quality = 95 if size_mb > 2 else 85
-            img.save(buffer, format='JPEG', quality=quality)
-        elif format == 'PNG':
-            img.save(buffer, format='PNG')
+            quality = 85
         elif format == 'WEBP':
-            img.save(buffer, format='WEBP', quality=95)
-        
-        buffer.seek(0)
-        
-        # Si necesitamos más tamaño, repetir contenido
-        content = buffer.read()
-        if size_mb > 1:
-            target_size = int(size_mb * 1024 * 1024)
-            while len(content) < target_size:
-                content += content[:min(len(content), target_size - len(content))]
+            quality = 95
+        else:
+            quality = None
+        content = _encode_image(format, width, height, 'red', quality)
         
         return SimpleUploadedFile(
             f"test_image.{format.lower()}",
-            content[:int(size_mb * 1024 * 1024)] if size_mb > 1 else content,
+            content,
             content_type=f"image/{format.lower()}"
         )
 
     def test_validate_image_size_accepts_valid_size(self):
         """Validador debe aceptar imágenes menores al límite"""
-        image = self.create_test_image(size_mb=2)  # 2MB < 5MB
+        image = _raw_blob(2)  # 2MB < 5MB
         try:
             validate_image_size(image)
         except ValidationError:
@@ -85,7 +133,7 @@ class ImageValidatorTests(TestCase):
 
     def test_validate_image_size_rejects_oversized(self):
         """Validador debe rechazar imágenes mayores a MAX_IMAGE_SIZE_MB"""
-        image = self.create_test_image(size_mb=6)  # 6MB > 5MB
+        image = _raw_blob(6)  # 6MB > 5MB
         
         with self.assertRaises(ValidationError) as cm:
             validate_image_size(image)
@@ -127,14 +175,9 @@ class ImageValidatorTests(TestCase):
         validator = ImageContentTypeValidator()
         
         # Crear un GIF simple
-        img = PILImage.new('RGB', (100, 100), color='blue')
-        buffer = BytesIO()
-        img.save(buffer, format='GIF')
-        buffer.seek(0)
-        
         image = SimpleUploadedFile(
             "test.gif",
-            buffer.read(),
+            _encode_image('GIF', 100, 100, 'blue'),
             content_type="image/gif"
         )
         
@@ -166,14 +209,9 @@ class ImageValidatorTests(TestCase):
         """Validador debe rechazar extensiones no permitidas incluso en modo fallback"""
         validator = ImageContentTypeValidator()
         
-        img = PILImage.new('RGB', (100, 100), color='green')
-        buffer = BytesIO()
-        img.save(buffer, format='BMP')
-        buffer.seek(0)
-        
         image = SimpleUploadedFile(
             "test.bmp",
-            buffer.read(),
+            _encode_image('BMP', 100, 100, 'green'),
             content_type=None  # Forzar fallback
         )
         
@@ -185,43 +223,45 @@ class ImageValidatorTests(TestCase):
 # TESTS DE PERMISOS
 # ============================================================================
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class PortfolioPermissionsTests(APITestCase):
     """Tests para IsWorkerAndOwnerOrReadOnly"""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Crear usuarios y perfiles de prueba"""
         # Worker 1 (dueño)
-        self.worker1 = User.objects.create_user(
+        cls.worker1 = User.objects.create_user(
             email="worker1@test.com",
             password="test123",
             role=User.Role.WORKER
         )
-        self.worker_profile1 = WorkerProfile.objects.get(user=self.worker1)
+        cls.worker_profile1 = WorkerProfile.objects.get(user=cls.worker1)
         
         # Worker 2 (no dueño)
-        self.worker2 = User.objects.create_user(
+        cls.worker2 = User.objects.create_user(
             email="worker2@test.com",
             password="test123",
             role=User.Role.WORKER
         )
-        self.worker_profile2 = WorkerProfile.objects.get(user=self.worker2)
+        cls.worker_profile2 = WorkerProfile.objects.get(user=cls.worker2)
         
         # Cliente
-        self.client_user = User.objects.create_user(
+        cls.client_user = User.objects.create_user(
             email="client@test.com",
             password="test123",
             role=User.Role.CLIENT
         )
         
         # Compañía
-        self.company_user = User.objects.create_user(
+        cls.company_user = User.objects.create_user(
             email="company@test.com",
             password="test123",
             role=User.Role.COMPANY
         )
         
         # Admin
-        self.admin_user = User.objects.create_user(
+        cls.admin_user = User.objects.create_user(
             email="admin@test.com",
             password="test123",
             role=User.Role.ADMIN,
@@ -229,8 +269,8 @@ class PortfolioPermissionsTests(APITestCase):
         )
         
         # Portfolio item del worker1
-        self.portfolio_item = PortfolioItem.objects.create(
-            worker=self.worker_profile1,
+        cls.portfolio_item = PortfolioItem.objects.create(
+            worker=cls.worker_profile1,
             title="Test Project",
             description="Test description"
         )
@@ -271,14 +311,9 @@ class PortfolioPermissionsTests(APITestCase):
         self.client.force_authenticate(user=self.worker1)
         
         # Crear imagen temporal
-        image = PILImage.new('RGB', (800, 600), color='blue')
-        buffer = BytesIO()
-        image.save(buffer, format='JPEG')
-        buffer.seek(0)
-        
         test_image = SimpleUploadedFile(
             "test.jpg",
-            buffer.read(),
+            TINY_JPEG,
             content_type="image/jpeg"
         )
         
@@ -321,31 +356,29 @@ class PortfolioPermissionsTests(APITestCase):
 # TESTS DE ENDPOINTS
 # ============================================================================
 
-@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS,
+)
 class PortfolioEndpointTests(APITestCase):
     """Tests de integración para endpoints de portfolio"""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Setup común para tests de endpoints"""
-        self.worker = User.objects.create_user(
+        cls.worker = User.objects.create_user(
             email="worker@test.com",
             password="test123",
             role=User.Role.WORKER
         )
-        self.worker_profile = WorkerProfile.objects.get(user=self.worker)
+        cls.worker_profile = WorkerProfile.objects.get(user=cls.worker)
+
+    def setUp(self):
         self.client.force_authenticate(user=self.worker)
 
-    def create_test_image(self, width=800, height=600):
+    def create_test_image(self):
         """Helper para crear imagen de prueba"""
-        img = PILImage.new('RGB', (width, height), color='red')
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG', quality=85)
-        buffer.seek(0)
-        return SimpleUploadedFile(
-            "test.jpg",
-            buffer.read(),
-            content_type="image/jpeg"
-        )
+        return SimpleUploadedFile("test.jpg", TINY_JPEG, content_type="image/jpeg")
 
     def test_create_portfolio_item_success(self):
         """Crear portfolio item con datos válidos debe funcionar"""
@@ -457,6 +490,7 @@ class PortfolioEndpointTests(APITestCase):
 # TESTS DE COMPRESIÓN
 # ============================================================================
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class ImageCompressionTests(TestCase):
     """Tests para compresión automática de imágenes"""
 
@@ -470,17 +504,9 @@ class ImageCompressionTests(TestCase):
         worker_profile = WorkerProfile.objects.get(user=worker)
         
         # Crear imagen grande (2000x1500)
-        img = PILImage.new('RGB', (2000, 1500), color='blue')
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG', quality=95)
-        buffer.seek(0)
-        
-        original_size = buffer.tell()
-        buffer.seek(0)
-        
         test_image = SimpleUploadedFile(
             "large_image.jpg",
-            buffer.read(),
+            _encode_image('JPEG', 2000, 1500, 'blue', 95),
             content_type="image/jpeg"
         )
         
@@ -495,11 +521,14 @@ class ImageCompressionTests(TestCase):
         # Verificar que la imagen existe
         self.assertTrue(item.image)
         
-        # Abrir imagen guardada y verificar dimensiones
-        saved_image = PILImage.open(item.image)
+        # Leer dimensiones del header JPEG guardado (PIL solo si no se encuentra el SOF)
+        item.image.open('rb')
+        header = item.image.read(64 * 1024)
+        item.image.seek(0)
+        width, _ = _jpeg_size(header) or PILImage.open(item.image).size
         
         # La imagen debe haber sido redimensionada (width <= 1600)
-        self.assertLessEqual(saved_image.width, 1600)
+        self.assertLessEqual(width, 1600)
 
     def test_corrupt_image_raises_validation_error(self):
         """Archivo corrupto debe levantar ValidationError"""
@@ -530,31 +559,149 @@ class ImageCompressionTests(TestCase):
             item.save()
 
 
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS,
+    PORTFOLIO_DEFER_IMAGE_COMPRESSION=True,
+)
+class DeferredImageCompressionTests(TestCase):
+    """Tests para la compresión diferida (compress_portfolio_images)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        worker = User.objects.create_user(
+            email="worker@test.com",
+            password="test123",
+            role=User.Role.WORKER
+        )
+        cls.worker_profile = WorkerProfile.objects.get(user=worker)
+
+    def create_item(self):
+        """Crea un item con una imagen de 2000px de ancho (requiere resize)"""
+        return PortfolioItem.objects.create(
+            worker=self.worker_profile,
+            title="Deferred Test",
+            image=SimpleUploadedFile(
+                "large_image.jpg",
+                _encode_image('JPEG', 2000, 1500, 'blue', 95),
+                content_type="image/jpeg"
+            )
+        )
+
+    def stored_width(self, item):
+        """Ancho de la imagen almacenada, leído del header JPEG"""
+        with item.image.open('rb') as stored:
+            return _jpeg_size(stored.read(64 * 1024))[0]
+
+    def test_upload_stores_original_uncompressed(self):
+        """Con compresión diferida se guarda el original sin comprimir"""
+        item = self.create_item()
+
+        self.assertFalse(item.is_compressed)
+        self.assertTrue(item.image_hash)
+        self.assertEqual(self.stored_width(item), 2000)
+
+    def test_command_compresses_pending_items(self):
+        """El comando comprime, marca is_compressed y elimina el original"""
+        item = self.create_item()
+        original_name = item.image.name
+        storage = item.image.storage
+
+        out = StringIO()
+        call_command('compress_portfolio_images', stdout=out)
+
+        item.refresh_from_db()
+        self.assertIn('1 imágenes comprimidas', out.getvalue())
+        self.assertTrue(item.is_compressed)
+        self.assertNotEqual(item.image.name, original_name)
+        self.assertLessEqual(self.stored_width(item), 1600)
+        self.assertFalse(storage.exists(original_name))
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    PASSWORD_HASHERS=FAST_PASSWORD_HASHERS,
+)
+class PortfolioImageDedupeTests(TestCase):
+    """Tests para la reutilización de imágenes idénticas (image_hash)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.worker_profile, cls.other_worker_profile = [
+            WorkerProfile.objects.get(user=User.objects.create_user(
+                email=email,
+                password="test123",
+                role=User.Role.WORKER
+            ))
+            for email in ("worker@test.com", "other@test.com")
+        ]
+
+    def create_item(self, worker_profile, content=TINY_JPEG):
+        return PortfolioItem.objects.create(
+            worker=worker_profile,
+            title="Dedupe Test",
+            image=SimpleUploadedFile("test.jpg", content, content_type="image/jpeg")
+        )
+
+    def test_image_hash_is_populated(self):
+        """El hash BLAKE2b (64 caracteres hex) se calcula sobre el original"""
+        item = self.create_item(self.worker_profile)
+
+        self.assertEqual(len(item.image_hash), 64)
+        self.assertEqual(item.image_hash, hashlib.blake2b(TINY_JPEG, digest_size=32).hexdigest())
+
+    def test_identical_upload_same_worker_reuses_file(self):
+        """Misma imagen del mismo trabajador: se reutiliza el archivo almacenado"""
+        first = self.create_item(self.worker_profile)
+        second = self.create_item(self.worker_profile)
+
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertTrue(second.is_compressed)
+
+    def test_identical_upload_other_worker_gets_own_file(self):
+        """Misma imagen de otro trabajador: no se comparte el archivo entre dueños"""
+        first = self.create_item(self.worker_profile)
+        second = self.create_item(self.other_worker_profile)
+
+        self.assertEqual(second.image_hash, first.image_hash)
+        self.assertNotEqual(second.image.name, first.image.name)
+        self.assertIn(f"worker_{self.other_worker_profile.id}/", second.image.name)
+
+    def test_different_upload_gets_own_file(self):
+        """Imagen distinta del mismo trabajador: archivo propio"""
+        first = self.create_item(self.worker_profile)
+        second = self.create_item(
+            self.worker_profile, _encode_image('JPEG', 8, 8, 'red', 10)
+        )
+
+        self.assertNotEqual(second.image_hash, first.image_hash)
+        self.assertNotEqual(second.image.name, first.image.name)
+
+
 # ============================================================================
 # TESTS DE CASOS EDGE
 # ============================================================================
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class PortfolioEdgeCaseTests(APITestCase):
     """Tests para casos límite y edge cases"""
 
-    def setUp(self):
-        self.worker = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.worker = User.objects.create_user(
             email="worker@test.com",
             password="test123",
             role=User.Role.WORKER
         )
-        self.worker_profile = WorkerProfile.objects.get(user=self.worker)
+        cls.worker_profile = WorkerProfile.objects.get(user=cls.worker)
 
     def test_title_gets_stripped(self):
         """Espacios extras en título deben ser eliminados"""
         self.client.force_authenticate(user=self.worker)
         
-        img = PILImage.new('RGB', (100, 100), color='red')
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG')
-        buffer.seek(0)
-        
-        image = SimpleUploadedFile("test.jpg", buffer.read(), content_type="image/jpeg")
+        image = SimpleUploadedFile(
+            "test.jpg", TINY_JPEG, content_type="image/jpeg"
+        )
         
         response = self.client.post(
             '/api/users/workers/portfolio/',
@@ -589,13 +736,15 @@ class PortfolioEdgeCaseTests(APITestCase):
 # TESTS DE RELACIÓN PORTFOLIO-ORDER
 # ============================================================================
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class PortfolioOrderRelationTests(APITestCase):
     """Tests para validación de orden asociada a portfolio"""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Configurar datos de prueba"""
         # Crear cliente
-        self.client_user = User.objects.create_user(
+        cls.client_user = User.objects.create_user(
             email='client@test.com',
             password='testpass123',
             first_name='Client',
@@ -604,7 +753,7 @@ class PortfolioOrderRelationTests(APITestCase):
         )
         
         # Crear trabajador (signal crea WorkerProfile automáticamente)
-        self.worker_user = User.objects.create_user(
+        cls.worker_user = User.objects.create_user(
             email='worker@test.com',
             password='testpass123',
             first_name='Worker',
@@ -613,38 +762,35 @@ class PortfolioOrderRelationTests(APITestCase):
         )
         
         # Obtener y actualizar el perfil creado automáticamente
-        self.worker_profile = self.worker_user.worker_profile
-        self.worker_profile.profession = 'PLUMBER'
-        self.worker_profile.hourly_rate = Decimal('25.00')
-        self.worker_profile.years_experience = 5
-        self.worker_profile.bio = 'Experienced plumber'
-        self.worker_profile.save()
+        cls.worker_profile = cls.worker_user.worker_profile
+        cls.worker_profile.profession = 'PLUMBER'
+        cls.worker_profile.hourly_rate = Decimal('25.00')
+        cls.worker_profile.years_experience = 5
+        cls.worker_profile.bio = 'Experienced plumber'
+        cls.worker_profile.save()
         
         # Crear órdenes con diferentes estados
-        self.completed_order = ServiceOrder.objects.create(
-            client=self.client_user,
-            worker=self.worker_profile,
+        cls.completed_order = ServiceOrder.objects.create(
+            client=cls.client_user,
+            worker=cls.worker_profile,
             description='Fix bathroom leak',
             status='COMPLETED'
         )
         
-        self.in_progress_order = ServiceOrder.objects.create(
-            client=self.client_user,
-            worker=self.worker_profile,
+        cls.in_progress_order = ServiceOrder.objects.create(
+            client=cls.client_user,
+            worker=cls.worker_profile,
             description='Install new pipes',
             status='IN_PROGRESS'
         )
-        
-        # Autenticar como trabajador
+
+    def setUp(self):
+        # Autenticar como trabajador (APIClient es por test)
         self.client.force_authenticate(user=self.worker_user)
 
     def create_test_image(self):
         """Helper para crear imagen de prueba"""
-        img = PILImage.new('RGB', (100, 100), color='blue')
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG')
-        buffer.seek(0)
-        return SimpleUploadedFile("test.jpg", buffer.read(), content_type="image/jpeg")
+        return SimpleUploadedFile("test.jpg", TINY_JPEG, content_type="image/jpeg")
 
     def test_portfolio_with_completed_order_succeeds(self):
         """Debe permitir asociar orden COMPLETED del trabajador"""
@@ -768,18 +914,20 @@ class PortfolioOrderRelationTests(APITestCase):
         self.assertEqual(order_info['description'], 'Fix bathroom leak')
 
 
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
 class CompletedOrdersWithoutPortfolioTests(APITestCase):
     """Tests para endpoint de órdenes completadas sin portfolio"""
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """Configurar datos de prueba"""
-        self.client_user = User.objects.create_user(
+        cls.client_user = User.objects.create_user(
             email='client@test.com',
             password='testpass123',
             role='CLIENT'
         )
         
-        self.worker_user = User.objects.create_user(
+        cls.worker_user = User.objects.create_user(
             email='worker@test.com',
             password='testpass123',
             first_name='John',
@@ -788,11 +936,11 @@ class CompletedOrdersWithoutPortfolioTests(APITestCase):
         )
         
         # Obtener y actualizar el perfil creado automáticamente
-        self.worker_profile = self.worker_user.worker_profile
-        self.worker_profile.profession = 'CARPENTER'
-        self.worker_profile.hourly_rate = Decimal('20.00')
-        self.worker_profile.years_experience = 4
-        self.worker_profile.save()
+        cls.worker_profile = cls.worker_user.worker_profile
+        cls.worker_profile.profession = 'CARPENTER'
+        cls.worker_profile.hourly_rate = Decimal('20.00')
+        cls.worker_profile.years_experience = 4
+        cls.worker_profile.save()
 
     def test_requires_authentication(self):
         """Endpoint debe requerir autenticación"""
@@ -15,6 +15,8 @@ from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from django.contrib.gis.geos import Point
+from users.management.commands.validate_corpus import Command as ValidateCorpusCommand
 from users.models import WorkerProfile
 
 User = get_user_model()
@@ -582,3 +584,90 @@ class ProfileManagementIntegrationTests(APITestCase):
             format='json'
         )
         self.assertEqual(login_response.status_code, status.HTTP_200_OK)
+
+
+# ============================================================================
+# TESTS DE CREACIÓN MASIVA
+# ============================================================================
+
+class BulkCreateWithProfilesTests(TestCase):
+    """Tests para User.objects.bulk_create_with_profiles"""
+    
+    def test_creates_worker_profiles_in_bulk(self):
+        """Solo los usuarios WORKER reciben WorkerProfile"""
+        users = [
+            User(email=f"bulk{i}@TEST.com", role=role)
+            for i, role in enumerate(["WORKER", "CLIENT", "WORKER"])
+        ]
+        for user in users:
+            user.set_password("testpass123")
+        
+        created = User.objects.bulk_create_with_profiles(users)
+        
+        self.assertEqual(len(created), 3)
+        self.assertEqual(created[0].email, "bulk0@test.com")
+        profiles = WorkerProfile.objects.filter(user__in=created)
+        self.assertEqual(profiles.count(), 2)
+        self.assertTrue(all(profile.is_active for profile in profiles))
+
+
+# ============================================================================
+# TESTS DE SINCRONIZACIÓN DE is_active
+# ============================================================================
+
+class WorkerProfileIsActiveSyncTests(TestCase):
+    """Tests para la copia desnormalizada WorkerProfile.is_active"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="activo@test.com",
+            password="testpass123",
+            role="WORKER"
+        )
+    
+    def test_user_save_syncs_profile(self):
+        """User.save() propaga is_active al perfil"""
+        self.user.is_active = False
+        self.user.save()
+        
+        self.assertFalse(WorkerProfile.objects.get(user=self.user).is_active)
+    
+    def test_fix_active_repairs_queryset_update(self):
+        """QuerySet.update() no sincroniza; --fix-active repara la copia"""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertTrue(WorkerProfile.objects.get(user=self.user).is_active)
+        
+        ValidateCorpusCommand()._sync_is_active()
+        
+        self.assertFalse(WorkerProfile.objects.get(user=self.user).is_active)
+
+
+class WorkerProfileIsGeolocatedTests(TestCase):
+    """Tests para la bandera derivada WorkerProfile.is_geolocated"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email="geo@test.com",
+            password="testpass123",
+            role="WORKER"
+        )
+        self.profile = WorkerProfile.objects.get(user=user)
+    
+    def test_partial_save_with_location_writes_flag(self):
+        """update_fields=['location'] también persiste is_geolocated"""
+        self.profile.location = Point(-74.08, 4.61, srid=4326)
+        self.profile.save(update_fields=['location'])
+        
+        self.assertTrue(WorkerProfile.objects.get(pk=self.profile.pk).is_geolocated)
+    
+    def test_partial_save_without_location_skips_recompute(self):
+        """Un save parcial sin location no toca la bandera"""
+        WorkerProfile.objects.filter(pk=self.profile.pk).update(
+            location=Point(-74.08, 4.61, srid=4326), is_geolocated=True
+        )
+        profile = WorkerProfile.objects.defer('location').get(pk=self.profile.pk)
+        profile.bio = "Bio nueva"
+        
+        with self.assertNumQueries(1):
+            profile.save(update_fields=['bio'])
+        self.assertTrue(profile.is_geolocated)
@@ -9,23 +9,37 @@ Cubre:
     - Autenticación y permisos
 """
 
-from django.test import TestCase
+import os
+import tempfile
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from users.models import WorkerProfile, RecommendationLog
+from users.services.recommendation_presenter import RecommendationPresenter
 from django.contrib.gis.geos import Point
 from decimal import Decimal
 
 User = get_user_model()
 
+# Modelo entrenado en un directorio temporal propio (se borra al terminar la
+# corrida): no pisa el de desarrollo con ningún módulo de settings
+_MODEL_DIR = tempfile.TemporaryDirectory(prefix='findmyworker-tests-')
+_MODEL_PATH = os.path.join(_MODEL_DIR.name, 'recommendation_model.joblib')
+
 
+@override_settings(RECOMMENDATION_MODEL_PATH=_MODEL_PATH)
 class RecommendationAPITestCase(TestCase):
     """Tests de integración para los endpoints de recomendación."""
     
     def setUp(self):
         """Setup inicial."""
+        # Analytics/health usan cache_page: evitar respuestas de otros tests
+        cache.clear()
         self.client = APIClient()
         
         self.user = User.objects.create_user(
@@ -204,6 +218,7 @@ class RecommendationAPITestCase(TestCase):
             self.assertGreater(len(response.data['recommendations']), 0)
 
 
+@override_settings(RECOMMENDATION_MODEL_PATH=_MODEL_PATH)
 class RecommendationRateLimitingTestCase(TestCase):
     """Tests para rate limiting."""
     
@@ -241,3 +256,40 @@ class RecommendationRateLimitingTestCase(TestCase):
         
         response = self.client.post(url, data, format='json')
         self.assertIn(response.status_code, [status.HTTP_200_OK, status.HTTP_503_SERVICE_UNAVAILABLE])
+
+
+class RecommendationPresenterTestCase(SimpleTestCase):
+    """Tests del recorte y filtrado de resultados en RecommendationPresenter."""
+    
+    @staticmethod
+    def _result(worker_id, score):
+        return {
+            'worker': SimpleNamespace(id=worker_id, location=None),
+            'score': score,
+            'relevance_percentage': round(score * 100, 1),
+            'explanation': {'matched_keywords': []},
+        }
+    
+    def test_prepare_worker_data_filters_sorts_and_truncates(self):
+        """Descarta scores 0, ordena por score y recorta a top_k."""
+        results = [
+            self._result(1, 0.2),
+            self._result(2, 0.0),
+            self._result(3, 0.9),
+            self._result(4, 0.5),
+        ]
+        
+        workers, worker_ids = RecommendationPresenter.prepare_worker_data(
+            results, top_k=2, min_score=0.0
+        )
+        
+        self.assertEqual(worker_ids, [3, 4])
+        self.assertEqual([w._recommendation.score for w in workers], [0.9, 0.5])
+    
+    def test_prepare_worker_data_keeps_all_by_default(self):
+        """Sin top_k ni min_score se conservan todos, en el orden del motor."""
+        results = [self._result(1, 0.0), self._result(2, 0.4)]
+        
+        _, worker_ids = RecommendationPresenter.prepare_worker_data(results)
+        
+        self.assertEqual(worker_ids, [1, 2])
@@ -10,16 +10,29 @@ Cubre:
     - Explicabilidad (XAI)
 """
 
-from django.test import TestCase
+import os
+import tempfile
+
+import numpy as np
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.contrib.gis.geos import Point
+from django.core.cache import cache
 from users.models import WorkerProfile
 from users.services import RecommendationEngine
+from users.services.recommendation_engine import PENDING_UPDATES_KEY
 from decimal import Decimal
+from unittest.mock import patch
 
 User = get_user_model()
 
+# Modelo entrenado en un directorio temporal propio (se borra al terminar la
+# corrida): no pisa el de desarrollo con ningún módulo de settings
+_MODEL_DIR = tempfile.TemporaryDirectory(prefix='findmyworker-tests-')
+_MODEL_PATH = os.path.join(_MODEL_DIR.name, 'recommendation_model.joblib')
+
 
+@override_settings(RECOMMENDATION_MODEL_PATH=_MODEL_PATH)
 class RecommendationEngineTestCase(TestCase):
     """Tests para el motor de recomendación."""
     
@@ -214,6 +227,24 @@ class RecommendationEngineTestCase(TestCase):
         self.assertIn('rating_boost', explanation['score_breakdown'])
         self.assertIn('proximity_boost', explanation['score_breakdown'])
     
+    def test_hybrid_rating_boost_uses_current_rating(self):
+        """El componente de rating sale de la fila hidratada, no del snapshot."""
+        self.engine.train_model(force_retrain=True)
+        plumber = self.workers[0]
+        WorkerProfile.objects.filter(pk=plumber.pk).update(average_rating=Decimal('2.5'))
+        
+        results = self.engine.get_recommendations(
+            query="plomero para reparar tubería",
+            strategy='hybrid',
+            top_n=3
+        )
+        
+        result = next(r for r in results if r['worker'].id == plumber.id)
+        expected = 2.5 / 5.0 * RecommendationEngine.HYBRID_WEIGHTS['rating_boost']
+        self.assertEqual(
+            result['explanation']['score_breakdown']['rating_boost'], round(expected, 3)
+        )
+    
     def test_get_recommendations_with_filters(self):
         """Test de filtros aplicados a las recomendaciones."""
         self.engine.train_model(force_retrain=True)
@@ -241,7 +272,23 @@ class RecommendationEngineTestCase(TestCase):
         # Todos deben ser electricistas
         for result in results:
             self.assertEqual(result['worker'].profession, 'ELECTRICIAN')
-    
+
+    def test_filters_checked_against_current_rows(self):
+        """Los filtros se reaplican a la fila actual, no solo al snapshot del modelo."""
+        self.engine.train_model(force_retrain=True)
+
+        # QuerySet.update no dispara señales: worker_meta conserva el rating 4.8
+        WorkerProfile.objects.filter(pk=self.workers[0].pk).update(average_rating=Decimal('3.0'))
+
+        results = self.engine.get_recommendations(
+            query="plomero reparación de fugas",
+            strategy='tfidf',
+            top_n=5,
+            filters={'min_rating': 4.0}
+        )
+
+        self.assertNotIn(self.workers[0].id, [r['worker'].id for r in results])
+
     def test_detect_profession(self):
         """Test de detección de profesión en el texto."""
         # Test 1: Detectar plomero
@@ -273,12 +320,12 @@ class RecommendationEngineTestCase(TestCase):
         # Necesitamos vectorizar y calcular similitud
         query_vector = self.engine.vectorizer.transform([processed_query])
         worker_idx = self.engine.worker_ids.index(str(worker.id))
-        worker_vector = self.engine.tfidf_matrix[worker_idx]
+        worker_vector = self.engine.tfidf_matrix[worker_idx:worker_idx + 1]
         
         from sklearn.metrics.pairwise import cosine_similarity
         similarity = cosine_similarity(query_vector, worker_vector)[0][0]
         
-        explanation = self.engine._explain_tfidf(processed_query, worker, similarity)
+        explanation = self.engine._explain_tfidf(query_vector, worker, similarity)
         
         # Verificar estructura
         self.assertIn('method', explanation)
@@ -332,7 +379,111 @@ class RecommendationEngineTestCase(TestCase):
         self.assertIsNone(self.engine.tfidf_matrix)
         self.assertEqual(len(self.engine.worker_ids), 0)
 
+    def test_update_worker(self):
+        """Test de actualización parcial de una fila del modelo."""
+        self.engine.train_model(force_retrain=True)
+        plumber = self.workers[0]
+
+        # Sin bio, el plomero deja de aparecer sin reentrenar el corpus
+        WorkerProfile.objects.filter(pk=plumber.pk).update(bio='')
+        plumber.refresh_from_db()
+        self.assertTrue(self.engine.update_worker(plumber))
+
+        self.assertEqual(len(self.engine.worker_ids), 3)
+        results = self.engine.get_recommendations(
+            query="necesito reparar fuga de agua urgente",
+            strategy='tfidf',
+            top_n=3
+        )
+        self.assertNotIn(plumber.id, [r['worker'].id for r in results])
+
+    def test_update_workers_reloads_newer_model_version(self):
+        """Una instancia con el modelo desactualizado no pisa filas de otra."""
+        self.engine.train_model(force_retrain=True)
+        stale_engine = RecommendationEngine()  # Misma versión que self.engine
+        plumber, electrician, painter = self.workers
+
+        # Textos con vocabulario conocido (no disparan la invalidación por drift)
+        plumber.bio = painter.bio
+        self.assertTrue(self.engine.update_worker(plumber))
+        electrician.bio = painter.bio
+        self.assertTrue(stale_engine.update_worker(electrician))
+
+        # El modelo persistido conserva ambas actualizaciones
+        fresh = RecommendationEngine()
+        for worker in (plumber, electrician):
+            idx = fresh._worker_id_to_idx[str(worker.id)]
+            expected = fresh.vectorizer.transform([fresh._worker_text(worker)]).toarray()
+            self.assertTrue(
+                np.allclose(fresh.tfidf_matrix[idx:idx + 1].toarray(), expected)
+            )
+
+    def test_profile_updates_coalesced_per_transaction(self):
+        """Varios saves en una transacción programan una sola actualización del modelo."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            for worker in self.workers:
+                worker.bio += ' Disponible fines de semana.'
+                worker.save()
+
+        self.assertEqual(len(callbacks), 1)
+
+    def test_profile_update_applied_on_next_query(self):
+        """El save solo encola el perfil; la siguiente query actualiza el modelo."""
+        self.engine.train_model(force_retrain=True)
+        cache.delete(PENDING_UPDATES_KEY)
+        version = cache.get('recommendation_model_data')['version']
+        plumber = self.workers[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            plumber.bio = ''
+            plumber.save()
+
+        # El request no tocó el modelo persistido
+        self.assertEqual(cache.get(PENDING_UPDATES_KEY), {plumber.pk})
+        self.assertEqual(cache.get('recommendation_model_data')['version'], version)
+
+        results = RecommendationEngine().get_recommendations(
+            query="necesito reparar fuga de agua urgente", strategy='tfidf', top_n=3
+        )
+
+        self.assertIsNone(cache.get(PENDING_UPDATES_KEY))
+        self.assertNotIn(plumber.id, [r['worker'].id for r in results])
+
+    def test_pending_updates_requeued_on_failure(self):
+        """Si la actualización parcial falla, los IDs vuelven a la cola."""
+        self.engine.train_model(force_retrain=True)
+        cache.delete(PENDING_UPDATES_KEY)
+        RecommendationEngine.queue_worker_updates([self.workers[0].pk])
+
+        with patch.object(RecommendationEngine, 'update_workers', side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                self.engine.apply_pending_updates()
+
+        self.assertEqual(cache.get(PENDING_UPDATES_KEY), {self.workers[0].pk})
+
+    def test_profile_update_without_model_fields_skips_model_update(self):
+        """Cambios en campos que no usa el modelo no programan actualización."""
+        worker = WorkerProfile.objects.get(pk=self.workers[0].pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            worker.years_experience += 1
+            worker.save()
+
+        self.assertEqual(len(callbacks), 0)
+
+    def test_profile_update_fields_decide_without_db_compare(self):
+        """Con update_fields no se consulta la fila: decide la intersección."""
+        worker = WorkerProfile.objects.get(pk=self.workers[0].pk)
+
+        self.assertFalse(worker.recommendation_fields_changed(['years_experience']))
+        with self.assertNumQueries(0):
+            self.assertTrue(worker.recommendation_fields_changed(['bio', 'years_experience']))
+
+        worker.location = Point(-74.1, 4.6, srid=4326)
+        self.assertTrue(worker.recommendation_fields_changed())
+
 
+@override_settings(RECOMMENDATION_MODEL_PATH=_MODEL_PATH)
 class RecommendationEngineEdgeCasesTestCase(TestCase):
     """Tests de casos extremos y edge cases."""
     
@@ -9,6 +9,9 @@ from rest_framework.response import Response
 from django.utils import timezone
 from django.db.models import Avg, Q
 from django.core.cache import cache
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_headers
 from collections import Counter
 import logging
 
@@ -21,6 +24,9 @@ from ..throttles import (
 
 logger = logging.getLogger(__name__)
 
+ANALYTICS_CACHE_SECONDS = 300
+HEALTH_CACHE_SECONDS = 60
+
 
 class RecommendationAnalyticsView(APIView):
     """
@@ -57,6 +63,10 @@ class RecommendationAnalyticsView(APIView):
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
     throttle_classes = [RecommendationAnalyticsThrottle]
     
+    # Aggregates change slowly: serve 200 responses from cache for 5 minutes.
+    # Auth and permissions still run first (the decorator wraps get, not dispatch)
+    @method_decorator(cache_page(ANALYTICS_CACHE_SECONDS))
+    @method_decorator(vary_on_headers('Authorization'))
     def get(self, request):
         days = int(request.query_params.get('days', 30))
         date_from = timezone.now() - timezone.timedelta(days=days)
@@ -113,18 +123,16 @@ class RecommendationAnalyticsView(APIView):
     
     def _calculate_engagement_metrics(self, logs, total_queries: int) -> dict:
         """Calculate user engagement metrics (CTR, conversion, MRR)."""
-        logs_with_click = logs.exclude(worker_clicked__isnull=True)
-        ctr = logs_with_click.count() / total_queries if total_queries > 0 else 0
-        
-        logs_with_hire = logs.exclude(worker_hired__isnull=True)
-        conversion_rate = logs_with_hire.count() / total_queries if total_queries > 0 else 0
+        # CTR and conversion rate in a single aggregate query
+        metrics = logs.feedback_metrics() if total_queries > 0 else {}
+        ctr = metrics.get('ctr', 0)
+        conversion_rate = metrics.get('conversion_rate', 0)
         
-        # Calculate MRR (Mean Reciprocal Rank)
-        mrr_values = []
-        for log in logs_with_click:
-            if log.click_position is not None:
-                mrr_values.append(log.reciprocal_rank)
-        avg_mrr = sum(mrr_values) / len(mrr_values) if mrr_values else 0
+        # Calculate MRR (Mean Reciprocal Rank) over clicked results only
+        avg_mrr = logs.filter(
+            worker_clicked__isnull=False,
+            click_position__isnull=False,
+        ).with_rr().aggregate(avg=Avg('rr'))['avg'] or 0
         
         return {
             'avg_ctr': round(ctr, 4),
@@ -230,6 +238,9 @@ class RecommendationHealthView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     throttle_classes = [RecommendationHealthThrottle]
     
+    # Only 200 responses are cached, so degraded/unhealthy states are never stale
+    @method_decorator(cache_page(HEALTH_CACHE_SECONDS))
+    @method_decorator(vary_on_headers('Authorization'))
     def get(self, request):
         health_data = {
             'checked_at': timezone.now(),
@@ -4,15 +4,19 @@ Worker Recommendation views.
 ML-powered semantic search for finding workers based on natural language queries.
 """
 from rest_framework import permissions, status
+from rest_framework.parsers import JSONParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 import logging
 import time
 
+from core.renderers import ORJSONRenderer
+
 from ..serializers import (
     RecommendationRequestSerializer,
     WorkerRecommendationSerializer,
 )
+from ..constants import DEFAULT_MAX_DISTANCE_KM
 from ..models import RecommendationLog
 from ..services import RecommendationEngine
 from ..services.recommendation_presenter import RecommendationPresenter
@@ -43,7 +47,9 @@ class WorkerRecommendationView(APIView):
             "min_rating": 4.0,    // optional
             "latitude": 11.2403,  // optional
             "longitude": -74.2110, // optional
-            "max_distance_km": 15  // optional
+            "max_distance_km": 15, // optional
+            "flat_user": false,    // optional, user_* fields instead of nested "user"
+            "include_details": true // optional, false omits "recommendation_details"
         }
     
     Response (200 OK):
@@ -69,6 +75,10 @@ class WorkerRecommendationView(APIView):
     
     permission_classes = [permissions.AllowAny]
     throttle_classes = [RecommendationSearchThrottle]
+    # JSON-only machine endpoint: pinned so project-level renderer/parser
+    # changes (e.g. a browsable API) never add negotiation work here
+    renderer_classes = (ORJSONRenderer,)
+    parser_classes = (JSONParser,)
     
     def post(self, request):
         start_time = time.time()
@@ -103,7 +113,13 @@ class WorkerRecommendationView(APIView):
             cache_hit = engine.vectorizer is not None and engine.tfidf_matrix is not None
             
             # 4. Prepare presentation data
-            recommendations_data, worker_ids = RecommendationPresenter.prepare_worker_data(results)
+            # Fallback ranks by rating alone, so a 0 score is a valid result there;
+            # TF-IDF based strategies never return an unrelated (0 score) worker
+            recommendations_data, worker_ids = RecommendationPresenter.prepare_worker_data(
+                results,
+                top_k=top_n,
+                min_score=None if strategy == 'fallback' else 0.0,
+            )
             
             # 5. Calculate performance metrics
             elapsed_ms = (time.time() - start_time) * 1000
@@ -123,7 +139,11 @@ class WorkerRecommendationView(APIView):
             # 7. Serialize workers
             workers_serializer = WorkerRecommendationSerializer(
                 recommendations_data,
-                many=True
+                many=True,
+                context={
+                    'flat_user': validated_data['flat_user'],
+                    'include_details': validated_data['include_details'],
+                }
             )
             
             # 8. Build response
@@ -175,7 +195,9 @@ class WorkerRecommendationView(APIView):
         if validated_data.get('latitude') and validated_data.get('longitude'):
             filters['latitude'] = validated_data['latitude']
             filters['longitude'] = validated_data['longitude']
-            filters['max_distance_km'] = validated_data.get('max_distance_km', 50)
+            filters['max_distance_km'] = validated_data.get('max_distance_km') or DEFAULT_MAX_DISTANCE_KM
+            if '_bbox' in validated_data:
+                filters['bbox'] = validated_data['_bbox']
         
         if validated_data.get('profession'):
             filters['profession'] = validated_data['profession']